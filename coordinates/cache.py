@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+MISSING = object()
+
+
+class CoordinatesCache:
+    """Общий для процесса LRU-кэш координат адресов с ограничением размера и временем жизни записей.
+
+    Вторым уровнем может служить кэш Django с алиасом django_cache_alias, тогда промахи первого уровня
+    ищутся в нем, и найденное одним воркером gunicorn становится доступно остальным.
+    """
+
+    def __init__(self, maxsize, ttl, django_cache_alias=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.django_cache_alias = django_cache_alias
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def shared_cache(self):
+        if self.django_cache_alias:
+            return caches[self.django_cache_alias]
+
+    @staticmethod
+    def get_shared_key(address):
+        return 'coordinates:' + hashlib.md5(address.encode()).hexdigest()
+
+    def get(self, address, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(address)
+            if item is not None:
+                expires_at, coordinates = item
+                if expires_at > now:
+                    self._items.move_to_end(address)
+                    self.hits += 1
+                    return coordinates
+                del self._items[address]
+
+        if self.shared_cache is not None:
+            coordinates = self.shared_cache.get(self.get_shared_key(address), MISSING)
+            if coordinates is not MISSING:
+                self._set_local(address, coordinates)
+                with self._lock:
+                    self.shared_hits += 1
+                return coordinates
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, address, coordinates, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._set_local(address, coordinates, ttl)
+        if self.shared_cache is not None:
+            self.shared_cache.set(self.get_shared_key(address), coordinates, timeout=ttl)
+
+    def delete(self, address):
+        with self._lock:
+            self._items.pop(address, None)
+        if self.shared_cache is not None:
+            self.shared_cache.delete(self.get_shared_key(address))
+
+    def _set_local(self, address, coordinates, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._items[address] = (time.monotonic() + ttl, coordinates)
+            self._items.move_to_end(address)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+coordinates_cache = CoordinatesCache(
+    maxsize=settings.COORDINATES_CACHE_SIZE,
+    ttl=settings.COORDINATES_CACHE_TTL,
+    django_cache_alias=settings.COORDINATES_CACHE_ALIAS,
+)
@@ -0,0 +1,47 @@
+import numpy as np
+from geopy import distance
+
+EARTH_RADIUS_KM = 6371.0088
+
+HAVERSINE = 'haversine'
+GEODESIC = 'geodesic'
+
+
+def calculate_haversine_distances(origins, destinations):
+    """Матрица расстояний по формуле гаверсинусов, точки задаются массивами (долгота, широта)"""
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+
+    origin_lon = origins[:, 0, np.newaxis]
+    origin_lat = origins[:, 1, np.newaxis]
+    destination_lon = destinations[np.newaxis, :, 0]
+    destination_lat = destinations[np.newaxis, :, 1]
+
+    a = (
+        np.sin((destination_lat - origin_lat) / 2) ** 2
+        + np.cos(origin_lat) * np.cos(destination_lat) * np.sin((destination_lon - origin_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def calculate_geodesic_distances(origins, destinations):
+    """Точная, но медленная матрица расстояний по геодезической линии"""
+    matrix = np.empty((len(origins), len(destinations)))
+    for row, (origin_lon, origin_lat) in enumerate(origins):
+        for column, (destination_lon, destination_lat) in enumerate(destinations):
+            matrix[row, column] = distance.distance(
+                (origin_lat, origin_lon),
+                (destination_lat, destination_lon),
+            ).km
+    return matrix
+
+
+def calculate_distances(origins, destinations, method=HAVERSINE):
+    """Матрица расстояний в км между всеми парами точек origins x destinations"""
+    if not len(origins) or not len(destinations):
+        return np.empty((len(origins), len(destinations)))
+    if method == GEODESIC:
+        return calculate_geodesic_distances(origins, destinations)
+    if method == HAVERSINE:
+        return calculate_haversine_distances(origins, destinations)
+    raise ValueError(f'Неизвестный способ расчета расстояний: {method}')
@@ -1,38 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import coordinates_cache, MISSING
 from .models import Location
+from .normalization import normalize_address
 import requests
 from django.conf import settings
+from django.db.models import Q
+
+from star_burger.instrumentation import measure
+
 
-def fetch_coordinates(apikey, address):
-    try:
-        location = Location.objects.only("longitude", "latitude").get(address=address)
-        return location.longitude, location.latitude
-    except Location.DoesNotExist:
-        pass
-
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
-    })
+def request_coordinates(apikey, address):
+    with measure('geocoder'):
+        response = requests.get(settings.YANDEX_GEOCODER_URL, params={
+            "geocode": address,
+            "apikey": apikey,
+            "format": "json",
+        }, timeout=settings.GEOCODER_TIMEOUT)
     response.raise_for_status()
     found_places = response.json()['response']['GeoObjectCollection']['featureMember']
 
     if not found_places:
-        lon = None
-        lat = None
+        return None, None
+
+    most_relevant = found_places[0]
+    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+    return float(lon), float(lat)
+
+
+def request_coordinates_batch(apikey, addresses, max_workers=None):
+    """Параллельно запрашивает координаты адресов у геокодера в пуле из max_workers потоков.
+
+    Адреса, на которых геокодер ответил ошибкой, в результат не попадают.
+    """
+    if not addresses:
+        return {}
+    max_workers = max_workers or settings.GEOCODER_MAX_WORKERS
+    # потоки пула не видят замеры текущего запроса, поэтому время геокодера меряем снаружи
+    with measure('geocoder'), ThreadPoolExecutor(max_workers=min(max_workers, len(addresses))) as executor:
+        futures = {
+            address: executor.submit(request_coordinates, apikey, address)
+            for address in addresses
+        }
+
+    coordinates = {}
+    for address, future in futures.items():
+        try:
+            coordinates[address] = future.result()
+        except requests.RequestException:
+            continue
+    return coordinates
+
+
+def cache_coordinates(address, coordinates):
+    """Кладет координаты в кэш, ненайденные адреса хранятся там не дольше, чем в Location"""
+    if None in coordinates:
+        coordinates_cache.set(address, coordinates, ttl=min(
+            settings.COORDINATES_CACHE_TTL,
+            settings.LOCATION_NOT_FOUND_TTL,
+        ))
     else:
-        most_relevant = found_places[0]
-        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+        coordinates_cache.set(address, coordinates)
+
+
+def get_location(apikey, address):
+    """Возвращает Location для адреса, при необходимости запрашивая координаты у геокодера.
+
+    Адрес ищется по нормализованной форме, поэтому разные записи одного адреса дают одно место.
+    Уже известные адреса, в том числе не найденные геокодером, повторно не запрашиваются: координаты
+    берутся из кэша или из Location. Устаревшие записи обновляет команда refresh_locations.
+    """
+    normalized_address = normalize_address(address or '')
+    if not normalized_address:
+        return None
+    cached_coordinates = coordinates_cache.get(normalized_address, MISSING)
+    location = (
+        Location.objects
+            .filter(Q(normalized_address=normalized_address) | Q(address=address))
+            .order_by('id')
+            .first()
+    )
+    if location:
+        if cached_coordinates is MISSING:
+            cache_coordinates(normalized_address, location.coordinates)
+        return location
+
+    if cached_coordinates is MISSING:
+        cached_coordinates = request_coordinates(apikey, address)
+        cache_coordinates(normalized_address, cached_coordinates)
+    lon, lat = cached_coordinates
+    location, _ = Location.objects.get_or_create(address=address, defaults={'longitude': lon, 'latitude': lat})
+    return location
+
+
+def fetch_coordinates_batch(apikey, addresses, max_workers=None):
+    """Возвращает словарь адрес -> (долгота, широта), для ненайденных адресов — (None, None).
+
+    Адреса, которых еще нет в Location, геокодируются параллельно в пуле из max_workers потоков
+    и сохраняются одним запросом. Адреса, на которых геокодер ответил ошибкой, в результат не попадают.
+    """
+    normalized_addresses = {}
+    for address in addresses:
+        normalized_address = normalize_address(address or '')
+        if normalized_address:
+            normalized_addresses.setdefault(normalized_address, address)
+
+    coordinates = {}
+    for normalized_address in normalized_addresses:
+        cached_coordinates = coordinates_cache.get(normalized_address, MISSING)
+        if cached_coordinates is not MISSING:
+            coordinates[normalized_address] = cached_coordinates
 
-    Location.objects.create(address=address, longitude=lon, latitude=lat)
-    return lon, lat
+    uncached_addresses = normalized_addresses.keys() - coordinates.keys()
+    if uncached_addresses:
+        locations = (
+            Location.objects
+                .filter(normalized_address__in=uncached_addresses)
+                .order_by('-id')
+                .values_list('normalized_address', 'longitude', 'latitude')
+        )
+        for normalized_address, lon, lat in locations:
+            coordinates[normalized_address] = (lon, lat)
+        for normalized_address in uncached_addresses & coordinates.keys():
+            cache_coordinates(normalized_address, coordinates[normalized_address])
 
+    missing_addresses = {
+        normalized_addresses[normalized_address]: normalized_address
+        for normalized_address in normalized_addresses.keys() - coordinates.keys()
+    }
+    new_locations = []
+    for address, (lon, lat) in request_coordinates_batch(apikey, missing_addresses, max_workers).items():
+        normalized_address = missing_addresses[address]
+        coordinates[normalized_address] = (lon, lat)
+        cache_coordinates(normalized_address, (lon, lat))
+        new_locations.append(Location(
+            address=address,
+            normalized_address=normalized_address,
+            longitude=lon,
+            latitude=lat,
+        ))
+    Location.objects.bulk_create(new_locations, ignore_conflicts=True)
 
-def get_address_coordinates(address, cache_of_coordinates):
-    coordinates = cache_of_coordinates.get(address)
-    cache_of_coordinates_modified = {**cache_of_coordinates}
-    if not coordinates and address:
-        coordinates = fetch_coordinates(settings.YANDEX_GEOCODER_KEY, address)
-        cache_of_coordinates_modified[address] = coordinates
-    return coordinates, cache_of_coordinates_modified
+    addresses_coordinates = {}
+    for address in addresses:
+        normalized_address = normalize_address(address or '')
+        if normalized_address in coordinates:
+            addresses_coordinates[address] = coordinates[normalized_address]
+    return addresses_coordinates
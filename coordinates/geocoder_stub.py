@@ -0,0 +1,57 @@
+"""Локальная заглушка Яндекс-геокодера для тестов и нагрузочных замеров.
+
+Отвечает в формате https://geocode-maps.yandex.ru/1.x. Координаты вычисляются из хэша адреса
+и лежат в пределах Москвы, адреса со словом «нигде» не находятся.
+"""
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+NOT_FOUND_MARKER = 'нигде'
+
+
+def get_stub_coordinates(address):
+    address_hash = zlib.crc32(address.encode())
+    lon = 37.35 + (address_hash % 10000) / 10000 * 0.5
+    lat = 55.55 + (address_hash // 10000 % 10000) / 10000 * 0.35
+    return round(lon, 6), round(lat, 6)
+
+
+class GeocoderStubHandler(BaseHTTPRequestHandler):
+    delay = 0
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        address = query.get('geocode', [''])[0]
+        if self.delay:
+            time.sleep(self.delay)
+
+        feature_member = []
+        if address and NOT_FOUND_MARKER not in address.lower():
+            lon, lat = get_stub_coordinates(address)
+            feature_member.append({'GeoObject': {'Point': {'pos': f'{lon} {lat}'}}})
+
+        self.server.requested_addresses.append(address)
+        body = json.dumps({'response': {'GeoObjectCollection': {'featureMember': feature_member}}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_geocoder_stub(host='127.0.0.1', port=0, delay=0):
+    """Запускает заглушку в фоновом потоке, возвращает сервер. URL сервера лежит в server.url"""
+    handler = type('GeocoderStubHandler', (GeocoderStubHandler,), {'delay': delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.requested_addresses = []
+    server.url = f'http://{host}:{server.server_address[1]}/1.x'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from coordinates.cache import coordinates_cache
+from coordinates.models import Location
+from coordinates.normalization import normalize_address
+
+
+class Command(BaseCommand):
+    help = 'Заполняет нормализованные адреса мест и объединяет места, адреса которых совпали после нормализации'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true',
+                            help='пересчитать нормализованные адреса у всех мест, а не только у незаполненных')
+
+    def handle(self, *args, **options):
+        self.fill_normalized_addresses(options['batch_size'], options['all'])
+        self.merge_duplicates()
+
+    def fill_normalized_addresses(self, batch_size, fill_all):
+        locations = Location.objects.only('id', 'address', 'normalized_address').order_by('id')
+        if not fill_all:
+            locations = locations.filter(normalized_address='')
+
+        filled_count = 0
+        last_id = 0
+        while True:
+            batch = list(locations.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for location in batch:
+                location.normalized_address = normalize_address(location.address)
+            Location.objects.bulk_update(batch, ['normalized_address'])
+            filled_count += len(batch)
+            last_id = batch[-1].id
+
+        self.stdout.write(f'Нормализовано адресов: {filled_count}')
+
+    @transaction.atomic
+    def merge_duplicates(self):
+        duplicated_addresses = (
+            Location.objects
+                .exclude(normalized_address='')
+                .values('normalized_address')
+                .annotate(locations_count=Count('id'))
+                .filter(locations_count__gt=1)
+                .values_list('normalized_address', flat=True)
+        )
+        # ссылки на места из других приложений, например рестораны и заказы
+        relations = [
+            relation for relation in Location._meta.related_objects
+            if relation.one_to_many or relation.one_to_one
+        ]
+
+        merged_count = 0
+        for normalized_address in duplicated_addresses.iterator():
+            locations = list(Location.objects.filter(normalized_address=normalized_address))
+            # оставляем найденное геокодером и самое свежее место
+            locations.sort(key=lambda location: (location.is_found, location.updated), reverse=True)
+            kept_location, *duplicates = locations
+            duplicate_ids = [location.id for location in duplicates]
+
+            for relation in relations:
+                relation.related_model.objects.filter(
+                    **{f'{relation.field.name}__in': duplicate_ids}
+                ).update(**{relation.field.name: kept_location})
+            Location.objects.filter(id__in=duplicate_ids).delete()
+            coordinates_cache.delete(normalized_address)
+            merged_count += len(duplicate_ids)
+
+        self.stdout.write(f'Удалено дублей: {merged_count}')
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from coordinates.cache import coordinates_cache
+from coordinates.geocoder_functions import request_coordinates_batch
+from coordinates.models import Location
+
+
+class Command(BaseCommand):
+    help = 'Заново геокодирует устаревшие места: найденные старше LOCATION_TTL и ненайденные старше LOCATION_NOT_FOUND_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='сколько мест обновлять за один проход')
+        parser.add_argument('--workers', type=int, default=settings.GEOCODER_MAX_WORKERS,
+                            help='сколько запросов к геокодеру выполнять одновременно')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='сколько мест обновить всего, по умолчанию все устаревшие')
+
+    def handle(self, *args, **options):
+        refreshed_count = 0
+        failed_ids = set()
+        while options['limit'] is None or refreshed_count < options['limit']:
+            batch_size = options['batch_size']
+            if options['limit'] is not None:
+                batch_size = min(batch_size, options['limit'] - refreshed_count)
+            locations = list(
+                Location.objects.stale().exclude(id__in=failed_ids).order_by('updated')[:batch_size]
+            )
+            if not locations:
+                break
+
+            coordinates = request_coordinates_batch(
+                settings.YANDEX_GEOCODER_KEY,
+                [location.address for location in locations],
+                max_workers=options['workers'],
+            )
+            refreshed_locations = []
+            for location in locations:
+                if location.address not in coordinates:
+                    failed_ids.add(location.id)
+                    continue
+                location.longitude, location.latitude = coordinates[location.address]
+                location.updated = timezone.now()
+                refreshed_locations.append(location)
+                coordinates_cache.delete(location.normalized_address)
+
+            Location.objects.bulk_update(refreshed_locations, ['longitude', 'latitude', 'updated'])
+            refreshed_count += len(refreshed_locations)
+
+        self.stdout.write(f'Обновлено мест: {refreshed_count}, ошибок геокодера: {len(failed_ids)}')
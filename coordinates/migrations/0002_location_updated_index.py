@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 18:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='location',
+            name='updated',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='дата обновления'),
+        ),
+    ]
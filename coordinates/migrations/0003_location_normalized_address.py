@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0002_location_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='normalized_address',
+            field=models.CharField(blank=True, db_index=True, max_length=500, verbose_name='нормализованный адрес'),
+        ),
+    ]
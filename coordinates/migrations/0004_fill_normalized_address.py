@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from coordinates.normalization import normalize_address
+
+
+def fill_normalized_address(apps, schema_editor):
+    Location = apps.get_model('coordinates', 'Location')
+
+    locations = []
+    for location in Location.objects.filter(normalized_address='').only('id', 'address').iterator():
+        location.normalized_address = normalize_address(location.address)
+        locations.append(location)
+        if len(locations) == 1000:
+            Location.objects.bulk_update(locations, ['normalized_address'])
+            locations = []
+    Location.objects.bulk_update(locations, ['normalized_address'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0003_location_normalized_address'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_normalized_address, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,60 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
+from .normalization import normalize_address
+
+
+class LocationQuerySet(models.QuerySet):
+    def found(self):
+        return self.filter(longitude__isnull=False, latitude__isnull=False)
+
+    def not_found(self):
+        return self.filter(Q(longitude__isnull=True) | Q(latitude__isnull=True))
+
+    def stale(self):
+        """Места, которые пора геокодировать заново. Ненайденные адреса устаревают быстрее найденных"""
+        now = timezone.now()
+        found_expired_at = now - timedelta(seconds=settings.LOCATION_TTL)
+        not_found_expired_at = now - timedelta(seconds=settings.LOCATION_NOT_FOUND_TTL)
+        return self.filter(
+            Q(longitude__isnull=False, latitude__isnull=False, updated__lt=found_expired_at)
+            | (Q(longitude__isnull=True) | Q(latitude__isnull=True)) & Q(updated__lt=not_found_expired_at)
+        )
+
 
 class Location(models.Model):
     address = models.CharField('адрес', max_length=500, unique=True)
+    normalized_address = models.CharField('нормализованный адрес', max_length=500, blank=True, db_index=True)
     longitude = models.FloatField(verbose_name='долгота', blank=True, null=True)
     latitude = models.FloatField(verbose_name='широта', blank=True, null=True)
-    updated = models.DateTimeField('дата обновления', default=timezone.now)
+    updated = models.DateTimeField('дата обновления', default=timezone.now, db_index=True)
+
+    objects = LocationQuerySet.as_manager()
 
     def __str__(self):
         return f'№{self.id} - {self.address[:50]}'
 
+    def save(self, *args, **kwargs):
+        self.normalized_address = normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+    @property
+    def is_found(self):
+        return self.longitude is not None and self.latitude is not None
+
+    @property
+    def is_stale(self):
+        ttl = settings.LOCATION_TTL if self.is_found else settings.LOCATION_NOT_FOUND_TTL
+        return self.updated < timezone.now() - timedelta(seconds=ttl)
+
+    @property
+    def coordinates(self):
+        return self.longitude, self.latitude
+
     class Meta():
         verbose_name = 'место'
         verbose_name_plural = 'места'
@@ -0,0 +1,46 @@
+import re
+
+ADDRESS_ABBREVIATIONS = {
+    'г': 'город',
+    'гор': 'город',
+    'обл': 'область',
+    'р-н': 'район',
+    'мкр': 'микрорайон',
+    'мкрн': 'микрорайон',
+    'ул': 'улица',
+    'пер': 'переулок',
+    'пр-т': 'проспект',
+    'пр-кт': 'проспект',
+    'просп': 'проспект',
+    'пр-д': 'проезд',
+    'б-р': 'бульвар',
+    'бул': 'бульвар',
+    'пл': 'площадь',
+    'наб': 'набережная',
+    'ш': 'шоссе',
+    'туп': 'тупик',
+    'д': 'дом',
+    'к': 'корпус',
+    'корп': 'корпус',
+    'стр': 'строение',
+    'кв': 'квартира',
+}
+
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s/-]')
+SPACED_HYPHEN_PATTERN = re.compile(r'\s*-\s*')
+
+
+def normalize_address(address):
+    """Приводит адрес к виду, в котором одинаковые адреса, записанные по-разному, совпадают.
+
+    Переводит в нижний регистр, заменяет «ё» на «е», убирает знаки препинания, лишние пробелы
+    и раскрывает распространенные сокращения: «Москва, ул. Тверская, д.1» -> «москва улица тверская дом 1».
+    """
+    address = address.casefold().replace('ё', 'е')
+    address = PUNCTUATION_PATTERN.sub(' ', address)
+    address = SPACED_HYPHEN_PATTERN.sub('-', address)
+    # отделяем сокращения, слитые с номером дома: «д1» -> «д 1»
+    address = re.sub(r'\b(д|к|корп|стр|кв)(\d)', r'\1 \2', address)
+    words = [word.strip('-/') for word in address.split()]
+    words = [ADDRESS_ABBREVIATIONS.get(word, word) for word in words if word]
+    return ' '.join(words)
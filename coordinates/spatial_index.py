@@ -0,0 +1,124 @@
+import heapq
+import math
+from collections import defaultdict
+
+from .distances import EARTH_RADIUS_KM, calculate_haversine_distances
+
+KM_PER_DEGREE = math.radians(1) * EARTH_RADIUS_KM
+
+
+class GridIndex:
+    """Пространственный индекс точек на сетке из ячеек cell_size x cell_size градусов.
+
+    Точки задаются как (ключ, долгота, широта). Поиск ближайших идет кольцами ячеек вокруг точки запроса
+    и останавливается, как только следующее кольцо гарантированно дальше уже найденных точек или
+    все подходящие точки уже просмотрены. Когда в кольце ячеек больше, чем занятых ячеек в индексе,
+    оставшиеся занятые ячейки просматриваются целиком: так одна далекая точка не заставляет обходить
+    тысячи пустых колец.
+    """
+
+    def __init__(self, points, cell_size=0.05):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.points = {}
+        max_abs_lat = 0
+        for key, lon, lat in points:
+            self.cells[self.get_cell(lon, lat)].append((key, lon, lat))
+            self.points[key] = (lon, lat)
+            max_abs_lat = max(max_abs_lat, abs(lat))
+        self.max_abs_lat = max_abs_lat
+        if self.cells:
+            cells_x = [x for x, _ in self.cells]
+            cells_y = [y for _, y in self.cells]
+            self.bounds = min(cells_x), max(cells_x), min(cells_y), max(cells_y)
+
+    @property
+    def size(self):
+        return len(self.points)
+
+    def __len__(self):
+        return self.size
+
+    def get_cell(self, lon, lat):
+        return math.floor(lon / self.cell_size), math.floor(lat / self.cell_size)
+
+    def iter_ring(self, cell, radius):
+        cell_x, cell_y = cell
+        if radius == 0:
+            yield cell
+            return
+        for dx in range(-radius, radius + 1):
+            yield cell_x + dx, cell_y - radius
+            yield cell_x + dx, cell_y + radius
+        for dy in range(-radius + 1, radius):
+            yield cell_x - radius, cell_y + dy
+            yield cell_x + radius, cell_y + dy
+
+    def get_max_radius(self, cell):
+        """Радиус самого дальнего кольца вокруг cell, в котором еще могут быть точки"""
+        min_x, max_x, min_y, max_y = self.bounds
+        return max(abs(cell[0] - min_x), abs(cell[0] - max_x), abs(cell[1] - min_y), abs(cell[1] - max_y))
+
+    def get_nearest(self, lon, lat, k, points):
+        """Ближайшие из points перебором, без обхода сетки"""
+        points = list(points)
+        if not points:
+            return []
+        distances = calculate_haversine_distances([(lon, lat)], [point[1:] for point in points])[0]
+        nearest = sorted(zip(distances, (key for key, _, _ in points)), key=lambda item: item[0])[:k]
+        return [(key, float(distance_to)) for distance_to, key in nearest]
+
+    def nearest(self, lon, lat, k, allowed_keys=None):
+        """Возвращает до k пар (ключ, км) ближайших к точке, отсортированных по расстоянию.
+
+        Если передан allowed_keys, рассматриваются только точки с ключами из этого множества.
+        """
+        if k <= 0 or not self.size:
+            return []
+
+        if allowed_keys is not None:
+            allowed_keys = {key for key in allowed_keys if key in self.points}
+            if len(allowed_keys) <= k:
+                return self.get_nearest(lon, lat, k, [(key, *self.points[key]) for key in allowed_keys])
+        points_count = self.size if allowed_keys is None else len(allowed_keys)
+
+        cell = self.get_cell(lon, lat)
+        max_radius = self.get_max_radius(cell)
+        # длина градуса долготы минимальна на самой удаленной от экватора широте
+        min_cos = math.cos(math.radians(min(89.9, max(self.max_abs_lat, abs(lat)))))
+        ring_step_km = self.cell_size * KM_PER_DEGREE * min_cos
+
+        heap = []
+        seen_count = 0
+        for radius in range(max_radius + 1):
+            if 8 * radius > len(self.cells):
+                # занятых ячеек меньше, чем ячеек в кольце: досматриваем их все, а не пустые кольца
+                ring_cells = [
+                    other_cell for other_cell in self.cells
+                    if max(abs(other_cell[0] - cell[0]), abs(other_cell[1] - cell[1])) >= radius
+                ]
+            else:
+                ring_cells = self.iter_ring(cell, radius)
+            candidates = [
+                point
+                for ring_cell in ring_cells
+                for point in self.cells.get(ring_cell, ())
+                if allowed_keys is None or point[0] in allowed_keys
+            ]
+            if candidates:
+                seen_count += len(candidates)
+                distances = calculate_haversine_distances([(lon, lat)], [point[1:] for point in candidates])[0]
+                for (key, _, _), distance_to in zip(candidates, distances):
+                    item = (-distance_to, key)
+                    if len(heap) < k:
+                        heapq.heappush(heap, item)
+                    elif item > heap[0]:
+                        heapq.heapreplace(heap, item)
+
+            if seen_count == points_count or 8 * radius > len(self.cells):
+                break
+            # точки из следующего кольца отстоят от точки запроса хотя бы на radius ячеек
+            if len(heap) == k and -heap[0][0] <= radius * ring_step_km:
+                break
+
+        return [(key, float(-distance_to)) for distance_to, key in sorted(heap, reverse=True)]
@@ -1,3 +1,128 @@
-from django.test import TestCase
+import random
+import time
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from .cache import CoordinatesCache, coordinates_cache
+from .distances import calculate_haversine_distances
+from .geocoder_functions import fetch_coordinates_batch, get_location
+from .geocoder_stub import start_geocoder_stub, get_stub_coordinates
+from .models import Location
+from .normalization import normalize_address
+from .spatial_index import GridIndex
+
+
+class FetchCoordinatesBatchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.geocoder = start_geocoder_stub(delay=0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.geocoder.shutdown()
+        cls.geocoder.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.geocoder.requested_addresses.clear()
+        coordinates_cache.clear()
+
+    def test_geocodes_only_missing_addresses(self):
+        Location.objects.create(address='Москва, Тверская 1', longitude=37.6, latitude=55.7)
+        addresses = ['Москва, Тверская 1', 'Москва, Арбат 10', 'Москва, нигде', '']
+
+        with override_settings(YANDEX_GEOCODER_URL=self.geocoder.url, GEOCODER_MAX_WORKERS=4):
+            with self.assertNumQueries(2):
+                coordinates = fetch_coordinates_batch('key', addresses)
+
+        self.assertCountEqual(self.geocoder.requested_addresses, ['Москва, Арбат 10', 'Москва, нигде'])
+        self.assertEqual(coordinates['Москва, Тверская 1'], (37.6, 55.7))
+        self.assertEqual(coordinates['Москва, Арбат 10'], get_stub_coordinates('Москва, Арбат 10'))
+        self.assertEqual(coordinates['Москва, нигде'], (None, None))
+        self.assertEqual(Location.objects.count(), 3)
+
+    def test_get_location_uses_cache(self):
+        with override_settings(YANDEX_GEOCODER_URL=self.geocoder.url):
+            location = get_location('key', 'Москва, Арбат 10')
+            Location.objects.all().delete()
+            cached_location = get_location('key', 'москва,  арбат 10')
+
+        self.assertEqual(self.geocoder.requested_addresses, ['Москва, Арбат 10'])
+        self.assertEqual(cached_location.coordinates, location.coordinates)
+
+
+class NormalizeAddressTest(TestCase):
+    def test_spellings_of_same_address_match(self):
+        self.assertEqual(normalize_address('Москва, Тверская 1'), normalize_address('москва,  тверская, 1'))
+        self.assertEqual(normalize_address('Москва, ул. Тверская, д.1'), 'москва улица тверская дом 1')
+        self.assertNotEqual(normalize_address('Москва, Тверская 1'), normalize_address('Москва, Тверская 11'))
+
+
+class CoordinatesCacheTest(TestCase):
+    def test_evicts_least_recently_used_and_expired(self):
+        cache = CoordinatesCache(maxsize=2, ttl=60)
+        cache.set('a', (1, 1))
+        cache.set('b', (2, 2))
+        cache.get('a')
+        cache.set('c', (3, 3))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), (1, 1))
+
+        cache.ttl = -1
+        cache.set('d', (None, None))
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.stats()['hits'], 2)
+        self.assertEqual(cache.stats()['misses'], 2)
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    @override_settings(METRICS_TOKEN='token')
+    def test_exported_to_metrics(self):
+        coordinates_cache.clear()
+        coordinates_cache.get('Москва, Арбат 10')
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer token')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('starburger_coordinates_cache_misses_total 1\n', response.content.decode())
+        self.assertIn('# TYPE starburger_coordinates_cache_evictions_total counter', response.content.decode())
+
+
+class GridIndexTest(TestCase):
+    def test_nearest_matches_brute_force(self):
+        generator = random.Random(1)
+        points = [(key, generator.uniform(37.3, 37.9), generator.uniform(55.5, 56)) for key in range(300)]
+        index = GridIndex(points, cell_size=0.05)
+        allowed_keys = set(range(0, 300, 3))
+
+        for _ in range(50):
+            lon, lat = generator.uniform(37.2, 38), generator.uniform(55.4, 56.1)
+            distances = calculate_haversine_distances([(lon, lat)], [point[1:] for point in points])[0]
+            expected = sorted(zip(distances, (point[0] for point in points)))
+            expected_allowed = [(distance, key) for distance, key in expected if key in allowed_keys]
+
+            self.assertEqual([key for key, _ in index.nearest(lon, lat, 5)], [key for _, key in expected[:5]])
+            self.assertEqual(
+                [key for key, _ in index.nearest(lon, lat, 5, allowed_keys)],
+                [key for _, key in expected_allowed[:5]],
+            )
+            self.assertEqual(len(index.nearest(lon, lat, 500)), 300)
+
+    def test_distant_point_with_few_allowed_keys(self):
+        generator = random.Random(1)
+        points = [(key, generator.uniform(37.3, 37.9), generator.uniform(55.5, 56)) for key in range(200)]
+        # Новосибирск: без ограничения обхода пришлось бы пройти тысячи пустых колец до него
+        points.append((200, 82.92, 55.03))
+        index = GridIndex(points, cell_size=0.01)
+
+        started_at = time.perf_counter()
+        nearest = index.nearest(37.6, 55.75, 5, allowed_keys={3, 200})
+        nearest_all = index.nearest(37.6, 55.75, 250)
+        duration = time.perf_counter() - started_at
+
+        self.assertEqual([key for key, _ in nearest], [3, 200])
+        self.assertGreater(nearest[1][1], 2500)
+        self.assertEqual(len(nearest_all), 201)
+        self.assertEqual(nearest_all[-1][0], 200)
+        self.assertLess(duration, 0.5)
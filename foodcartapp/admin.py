@@ -11,6 +11,8 @@ from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import Order
 from .models import OrderItem
+from .models import OrderCandidateRestaurant
+from .models import OrderProcessingTask
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -43,6 +45,10 @@ class ProductAdmin(admin.ModelAdmin):
         'category',
         'price',
     ]
+    # категория необязательна, поэтому админка сама не подтягивает ее в список
+    list_select_related = [
+        'category',
+    ]
     list_display_links = [
         'name',
     ]
@@ -117,17 +123,45 @@ class OrderItemInline(admin.TabularInline):
     model = OrderItem
 
 
+class OrderCandidateRestaurantInline(admin.TabularInline):
+    model = OrderCandidateRestaurant
+    fields = ('restaurant', 'distance')
+    readonly_fields = ('restaurant', 'distance')
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'status', 'lastname', 'firstname', 'phonenumber', 'created_at')
+    list_display = ('id', 'status', 'lastname', 'firstname', 'phonenumber', 'total', 'created_at')
     list_display_links = ('id',)
+    readonly_fields = ('total',)
     inlines = [
         OrderItemInline,
+        OrderCandidateRestaurantInline,
     ]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Order.objects.filter(pk=form.instance.pk).update_totals()
+        items_changed = any(formset.has_changed() for formset in formsets if formset.model is OrderItem)
+        if items_changed and not form.instance.processing_tasks.filter(status=OrderProcessingTask.PENDING).exists():
+            # рестораны для доски заказов зависят от товаров, их заново подберет фоновый обработчик
+            OrderProcessingTask.objects.create(order=form.instance)
+
     def response_post_save_change(self, request, obj):
         res = super().response_post_save_change(request, obj)
         if "next" in request.GET and url_has_allowed_host_and_scheme(request.GET['next'], None):
             return redirect(request.GET['next'])
         else:
             return res
+
+
+@admin.register(OrderProcessingTask)
+class OrderProcessingTaskAdmin(admin.ModelAdmin):
+    list_display = ('order', 'status', 'attempts', 'created_at', 'run_after', 'finished_at')
+    list_filter = ('status',)
+    raw_id_fields = ('order',)
@@ -0,0 +1,146 @@
+"""Данные каталога товаров и его версия для кэширования /api/products/.
+
+Версия меняется при любом изменении товаров, категорий и меню ресторанов (см. signals.py)
+и хранится в кэше Django CATALOG_CACHE_ALIAS. Чтобы версия была общей для всех воркеров,
+этот кэш должен быть общим, например Redis или Memcached: с кэшем в памяти процесса воркеры
+не узнают о смене версии и отдают устаревший каталог. Если CATALOG_CACHE_ALIAS не задан,
+каталог не кэшируется, а ETag и Last-Modified не выдаются.
+"""
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+
+from .models import Product, RestaurantMenuItem
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def get_catalog_cache():
+    """Возвращает кэш каталога или None, если кэширование каталога выключено"""
+    if settings.CATALOG_CACHE_ALIAS:
+        return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def bump_catalog_version():
+    cache = get_catalog_cache()
+    if cache is None:
+        return None
+    version = {'id': uuid.uuid4().hex, 'modified': time.time()}
+    cache.set(CATALOG_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def get_catalog_version():
+    """Возвращает текущую версию каталога — словарь с ключами id и modified (timestamp изменения).
+
+    Без кэша каталога версии нет, тогда возвращает None.
+    """
+    cache = get_catalog_cache()
+    if cache is None:
+        return None
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # версии еще нет: берем ту, что успел сохранить параллельный запрос, или свою
+        cache.add(CATALOG_VERSION_KEY, {'id': uuid.uuid4().hex, 'modified': time.time()}, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def get_cached_catalog(name, build, version=None):
+    """Возвращает данные каталога name для текущей версии, при промахе строит их функцией build"""
+    cache = get_catalog_cache()
+    if cache is None:
+        return build()
+    version = version or get_catalog_version()
+    key = f'catalog:{name}:{version["id"]}'
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, timeout=settings.CATALOG_CACHE_TTL)
+    return data
+
+
+def dump_banners():
+    # FIXME move data to db?
+    return [
+        {
+            'title': 'Burger',
+            'src': static('burger.jpg'),
+            'text': 'Tasty Burger at your door step',
+        },
+        {
+            'title': 'Spices',
+            'src': static('food.jpg'),
+            'text': 'All Cuisines',
+        },
+        {
+            'title': 'New York',
+            'src': static('tasty.jpg'),
+            'text': 'Food is incomplete without a tasty dessert',
+        }
+    ]
+
+
+# поле ответа -> (колонки для values(), функция, которая строит значение поля из строки values())
+PRODUCT_FIELDS = {
+    'id': (['id'], lambda product: product['id']),
+    'name': (['name'], lambda product: product['name']),
+    'price': (['price'], lambda product: product['price']),
+    'special_status': (['special_status'], lambda product: product['special_status']),
+    'description': (['description'], lambda product: product['description']),
+    'category': (['category_id', 'category__name'], lambda product: {
+        'id': product['category_id'],
+        'name': product['category__name'],
+    } if product['category_id'] else None),
+    'image': (['image'], lambda product: default_storage.url(product['image'])),
+    # рестораны, где товар есть в продаже, dump_products читает отдельным запросом
+    'restaurants': (['id'], None),
+}
+
+
+def get_products_restaurants(product_ids):
+    """Возвращает словарь id товара -> рестораны, где он есть в продаже"""
+    menu_items = (
+        RestaurantMenuItem.objects
+            .filter(availability=True, product_id__in=product_ids)
+            .order_by('restaurant_id')
+            .values_list('product_id', 'restaurant_id', 'restaurant__name')
+    )
+    products_restaurants = defaultdict(list)
+    for product_id, restaurant_id, restaurant_name in menu_items:
+        products_restaurants[product_id].append({'id': restaurant_id, 'name': restaurant_name})
+    return products_restaurants
+
+
+def dump_products(fields=None, category_ids=None, after=None, limit=None):
+    """Возвращает доступные товары в порядке id, из базы читаются только колонки запрошенных полей.
+
+    fields — поля ответа из PRODUCT_FIELDS, по умолчанию все. after и limit задают страницу:
+    товары с id больше after, не больше limit штук.
+    """
+    fields = [field for field in PRODUCT_FIELDS if fields is None or field in fields]
+    columns = {column for field in fields for column in PRODUCT_FIELDS[field][0]}
+
+    products = Product.objects.available().order_by('id')
+    if category_ids:
+        products = products.filter(category_id__in=category_ids)
+    if after is not None:
+        products = products.filter(id__gt=after)
+    if limit is not None:
+        products = products[:limit]
+
+    products = list(products.values(*columns))
+    dumped_products = [
+        {field: PRODUCT_FIELDS[field][1](product) for field in fields if PRODUCT_FIELDS[field][1]}
+        for product in products
+    ]
+    if 'restaurants' in fields:
+        products_restaurants = get_products_restaurants([product['id'] for product in products])
+        for product, dumped_product in zip(products, dumped_products):
+            dumped_product['restaurants'] = products_restaurants[product['id']]
+    return dumped_products
@@ -0,0 +1,106 @@
+"""Снимок каталога: ответы /api/products/ и /api/banners/, заранее записанные в файлы.
+
+Файлы лежат в CATALOG_SNAPSHOT_DIR под именами с хэшем содержимого, рядом со сжатыми
+копиями .gz и .br, чтобы nginx отдавал их сам через gzip_static/brotli_static. Адреса текущих
+файлов записаны в manifest.json, его читает view catalog_snapshot_api. Файлы brotli пишутся,
+только если установлен пакет Brotli.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from collections import defaultdict
+
+from django.conf import settings
+
+from star_burger.renderers import dumps
+
+from .catalog import bump_catalog_version, dump_banners, dump_products
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def write_file(path, content):
+    # пишем во временный файл и переименовываем, чтобы nginx не отдал недописанный файл;
+    # имя временного файла уникально, потому что снимок могут пересобирать несколько воркеров сразу
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'.{os.path.basename(path)}.')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_snapshot_file(name, data):
+    """Записывает data в JSON-файл с хэшем содержимого в имени и возвращает имя файла"""
+    content = dumps(data)
+    filename = f'{name}.{hashlib.sha256(content).hexdigest()[:12]}.json'
+    path = os.path.join(settings.CATALOG_SNAPSHOT_DIR, filename)
+    if not os.path.exists(path):
+        write_file(f'{path}.gz', gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli:
+            write_file(f'{path}.br', brotli.compress(content))
+        write_file(path, content)
+    return filename
+
+
+def remove_old_snapshots(current_filenames):
+    """Удаляет старые снимки, кроме CATALOG_SNAPSHOT_KEEP последних каждого вида.
+
+    Прежние снимки нужны клиентам, которые получили их адрес до пересборки.
+    """
+    old_snapshots = defaultdict(list)
+    for entry in os.scandir(settings.CATALOG_SNAPSHOT_DIR):
+        if entry.name.endswith('.json') and entry.name != MANIFEST_NAME and entry.name not in current_filenames:
+            name = entry.name.split('.')[0]
+            try:
+                old_snapshots[name].append((entry.stat().st_mtime, entry.name))
+            except FileNotFoundError:
+                # файл уже удалил воркер, который пересобирал снимок одновременно с этим
+                continue
+
+    for snapshots in old_snapshots.values():
+        for _, filename in sorted(snapshots, reverse=True)[settings.CATALOG_SNAPSHOT_KEEP:]:
+            for suffix in ('', '.gz', '.br'):
+                try:
+                    os.remove(os.path.join(settings.CATALOG_SNAPSHOT_DIR, filename + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+def build_catalog_snapshot():
+    """Собирает снимок каталога и возвращает адреса его файлов"""
+    os.makedirs(settings.CATALOG_SNAPSHOT_DIR, exist_ok=True)
+    filenames = {
+        'products': write_snapshot_file('products', dump_products()),
+        'banners': write_snapshot_file('banners', dump_banners()),
+    }
+    snapshot = {name: settings.CATALOG_SNAPSHOT_URL + filename for name, filename in filenames.items()}
+    write_file(os.path.join(settings.CATALOG_SNAPSHOT_DIR, MANIFEST_NAME), json.dumps(snapshot).encode())
+    remove_old_snapshots(set(filenames.values()))
+    return snapshot
+
+
+def get_catalog_snapshot():
+    try:
+        with open(os.path.join(settings.CATALOG_SNAPSHOT_DIR, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def refresh_catalog():
+    """Сбрасывает кэш каталога после его изменения и, если включено, пересобирает снимок"""
+    bump_catalog_version()
+    if settings.CATALOG_SNAPSHOT_ON_CHANGE:
+        build_catalog_snapshot()
@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from foodcartapp.models import Product
+from foodcartapp.order_validation import validate_order_payload
+from foodcartapp.views import OrderSerializer
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость проверки заказа OrderSerializer и быстрым валидатором'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000,
+                            help='сколько раз проверить заказ без обращения к базе')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='сколько запросов POST /api/order/ отправить каждым способом')
+        parser.add_argument('--items', type=int, default=5, help='сколько позиций в заказе')
+
+    def handle(self, *args, **options):
+        products = Product.objects.in_bulk(
+            list(Product.objects.order_by('id').values_list('id', flat=True)[:options['items']])
+        )
+        if not products:
+            raise CommandError('В базе нет товаров, создайте их, например, командой generate_fixtures')
+
+        payload = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, ул. Тверская, д. 1',
+            'products': [
+                {'product': product_id, 'quantity': 2}
+                for product_id in list(products) * (options['items'] // len(products) + 1)
+            ][:options['items']],
+        }
+
+        serializer_rate = self.measure(
+            options['iterations'],
+            lambda: OrderSerializer(data=payload, context={'products': products}).is_valid(raise_exception=True),
+        )
+        fast_rate = self.measure(
+            options['iterations'],
+            lambda: validate_order_payload(payload, products),
+        )
+        self.report('Проверка заказа, проверок/с', serializer_rate, fast_rate)
+
+        client = Client()
+        body = json.dumps(payload)
+
+        def post_order():
+            response = client.post('/api/order/', body, content_type='application/json')
+            if response.status_code != 200:
+                raise CommandError(f'POST /api/order/ ответил {response.status_code}: {response.content[:200]}')
+
+        rates = []
+        for fast_validation in (False, True):
+            with override_settings(ORDER_FAST_VALIDATION=fast_validation, ALLOWED_HOSTS=['*']), \
+                    transaction.atomic():
+                rates.append(self.measure(options['requests'], post_order))
+                transaction.set_rollback(True)
+        self.report('POST /api/order/, запросов/с', *rates)
+
+    @staticmethod
+    def measure(iterations, func):
+        func()
+        started_at = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return iterations / (time.perf_counter() - started_at)
+
+    def report(self, title, serializer_rate, fast_rate):
+        self.stdout.write(title)
+        self.stdout.write(f'  OrderSerializer:       {serializer_rate:10.1f}')
+        self.stdout.write(f'  validate_order_payload: {fast_rate:10.1f}  (x{fast_rate / serializer_rate:.2f})')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.catalog_snapshot import build_catalog_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Записывает ответы /api/products/ и /api/banners/ в сжатые файлы для отдачи через nginx'
+
+    def handle(self, *args, **options):
+        snapshot = build_catalog_snapshot()
+        for name, url in snapshot.items():
+            self.stdout.write(f'{name}: {url}')
@@ -0,0 +1,198 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from coordinates.models import Location
+from coordinates.normalization import normalize_address
+from foodcartapp.catalog_snapshot import refresh_catalog
+from foodcartapp.menus import invalidate_restaurant_menus
+from foodcartapp.models import Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem
+
+MOSCOW_CENTER = (37.6173, 55.7558)
+MOSCOW_BOUNDS = ((37.35, 55.55), (37.85, 55.92))
+STREETS = [
+    'ул. Тверская', 'ул. Арбат', 'Ленинский пр-т', 'Кутузовский пр-т', 'ул. Покровка', 'ул. Сретенка',
+    'Профсоюзная ул.', 'ул. Вавилова', 'Волгоградский пр-т', 'ул. Новый Арбат', 'Мичуринский пр-т',
+    'ул. Бутырская', 'Варшавское ш.', 'ул. Маросейка', 'пр-т Мира', 'Ленинградский пр-т',
+]
+CATEGORIES = ['Бургеры', 'Роллы', 'Пицца', 'Салаты', 'Напитки', 'Десерты', 'Супы', 'Закуски']
+FIRSTNAMES = ['Иван', 'Анна', 'Петр', 'Мария', 'Сергей', 'Ольга', 'Алексей', 'Елена']
+LASTNAMES = ['Иванов', 'Смирнова', 'Кузнецов', 'Попова', 'Соколов', 'Лебедева', 'Козлов', 'Новикова']
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу случайными ресторанами, товарами, меню и заказами с координатами в пределах Москвы. '
+        'Записи добавляются к уже существующим, геокодер не вызывается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=20)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--max-items', type=int, default=5, help='сколько разных товаров бывает в заказе')
+        parser.add_argument('--menu-share', type=float, default=0.6,
+                            help='какая доля товаров есть в меню каждого ресторана')
+        parser.add_argument('--days', type=int, default=30, help='за сколько последних дней создавать заказы')
+        parser.add_argument('--seed', type=int, default=None, help='зерно генератора, чтобы повторить набор данных')
+        parser.add_argument('--batch-size', type=int, default=1000, help='сколько строк вставлять одним запросом')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.address_number = Location.objects.count()
+
+        with transaction.atomic():
+            restaurants = self.create_restaurants(options['restaurants'])
+            products = self.create_products(options['products'])
+            menu_items = self.create_menu_items(restaurants, products, options['menu_share'])
+            orders_count, order_items_count = self.create_orders(products, options['orders'],
+                                                                 options['max_items'], options['days'])
+            self.reset_sequences()
+        # bulk_create не отправляет сигналы, поэтому кэш каталога сбрасываем сами
+        refresh_catalog()
+        invalidate_restaurant_menus([restaurant.id for restaurant in restaurants])
+
+        self.stdout.write(
+            f'Создано: ресторанов {len(restaurants)}, товаров {len(products)}, пунктов меню {len(menu_items)}, '
+            f'заказов {orders_count}, позиций заказов {order_items_count}'
+        )
+
+    def get_next_ids(self, model, count):
+        """Выдает id новым строкам заранее: bulk_create в SQLite не возвращает первичные ключи"""
+        max_id = model.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        return range(max_id + 1, max_id + count + 1)
+
+    def create_locations(self, count):
+        """Создает места со случайными адресами, которые скапливаются к центру Москвы"""
+        (min_lon, min_lat), (max_lon, max_lat) = MOSCOW_BOUNDS
+        locations = []
+        for location_id in self.get_next_ids(Location, count):
+            self.address_number += 1
+            address = f'Москва, {self.random.choice(STREETS)}, д. {self.address_number}'
+            lon = min(max(self.random.gauss(MOSCOW_CENTER[0], 0.08), min_lon), max_lon)
+            lat = min(max(self.random.gauss(MOSCOW_CENTER[1], 0.05), min_lat), max_lat)
+            locations.append(Location(
+                id=location_id,
+                address=address,
+                normalized_address=normalize_address(address),
+                longitude=round(lon, 6),
+                latitude=round(lat, 6),
+            ))
+        return Location.objects.bulk_create(locations, batch_size=self.batch_size)
+
+    def create_restaurants(self, count):
+        restaurants = [
+            Restaurant(
+                id=restaurant_id,
+                name=f'Star Burger {restaurant_id}',
+                address=location.address,
+                contact_phone=self.get_phonenumber(),
+                location=location,
+            )
+            for restaurant_id, location in zip(self.get_next_ids(Restaurant, count), self.create_locations(count))
+        ]
+        return Restaurant.objects.bulk_create(restaurants, batch_size=self.batch_size)
+
+    def create_products(self, count):
+        categories = list(ProductCategory.objects.filter(name__in=CATEGORIES))
+        new_categories = [
+            ProductCategory(id=category_id, name=name)
+            for category_id, name in zip(
+                self.get_next_ids(ProductCategory, len(CATEGORIES)),
+                sorted(set(CATEGORIES) - {category.name for category in categories}),
+            )
+        ]
+        categories += ProductCategory.objects.bulk_create(new_categories)
+        images = list(Product.objects.exclude(image='').values_list('image', flat=True).distinct()[:20])
+
+        products = []
+        for product_id in self.get_next_ids(Product, count):
+            category = self.random.choice(categories)
+            products.append(Product(
+                id=product_id,
+                name=f'{category.name} №{product_id}',
+                category=category,
+                price=Decimal(self.random.randrange(100, 1500, 10)),
+                image=self.random.choice(images) if images else 'fixtures/product.jpg',
+                special_status=self.random.random() < 0.1,
+                description=f'{category.name}, позиция {product_id}',
+            ))
+        return Product.objects.bulk_create(products, batch_size=self.batch_size)
+
+    def create_menu_items(self, restaurants, products, menu_share):
+        menu_size = max(1, round(len(products) * menu_share)) if products else 0
+        menu_items = [
+            RestaurantMenuItem(
+                restaurant=restaurant,
+                product=product,
+                availability=self.random.random() < 0.9,
+            )
+            for restaurant in restaurants
+            for product in self.random.sample(products, menu_size)
+        ]
+        return RestaurantMenuItem.objects.bulk_create(menu_items, batch_size=self.batch_size)
+
+    def create_orders(self, products, count, max_items, days):
+        """Создает заказы пачками по batch_size, чтобы не держать в памяти все заказы сразу.
+
+        Возвращает число созданных заказов и позиций заказов.
+        """
+        if not products:
+            return 0, 0
+        orders_count = 0
+        order_items_count = 0
+        for chunk_start in range(0, count, self.batch_size):
+            orders, order_items = self.generate_orders(
+                products, min(self.batch_size, count - chunk_start), max_items, days,
+            )
+            Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(order_items, batch_size=self.batch_size)
+            orders_count += len(orders)
+            order_items_count += len(order_items)
+        return orders_count, order_items_count
+
+    def generate_orders(self, products, count, max_items, days):
+        now = timezone.now()
+        orders = []
+        order_items = []
+        for order_id, location in zip(self.get_next_ids(Order, count), self.create_locations(count)):
+            order = Order(
+                id=order_id,
+                firstname=self.random.choice(FIRSTNAMES),
+                lastname=self.random.choice(LASTNAMES),
+                phonenumber=self.get_phonenumber(),
+                address=location.address,
+                location=location,
+                created_at=now - timedelta(seconds=self.random.randrange(days * 24 * 60 * 60)),
+                status=self.random.choice(['NEW', 'NEW', 'NEW', 'CLOSED']),
+                payment_method=self.random.choice(['UNDEFINED', 'CARD', 'CASH']),
+            )
+            items_count = self.random.randint(1, min(max_items, len(products)))
+            for product in self.random.sample(products, items_count):
+                order_items.append(OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=self.random.randint(1, 3),
+                    price=product.price,
+                ))
+                order.total += product.price * order_items[-1].quantity
+            orders.append(order)
+        return orders, order_items
+
+    def get_phonenumber(self):
+        return f'+7999{self.random.randrange(10 ** 7):07d}'
+
+    @staticmethod
+    def reset_sequences():
+        """Сдвигает счетчики первичных ключей за id, выданные вручную"""
+        models = [Location, Restaurant, ProductCategory, Product, Order]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from coordinates.geocoder_functions import fetch_coordinates_batch
+from coordinates.models import Location
+from coordinates.normalization import normalize_address
+from foodcartapp.models import Order, Restaurant
+
+
+class Command(BaseCommand):
+    help = 'Находит координаты ресторанов и заказов, адреса которых еще не геокодированы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.GEOCODER_MAX_WORKERS,
+                            help='сколько запросов к геокодеру выполнять одновременно')
+
+    def handle(self, *args, **options):
+        for model in (Restaurant, Order):
+            objects = list(model.objects.filter(location__isnull=True).exclude(address='').only('id', 'address'))
+            if not objects:
+                continue
+
+            addresses = {obj.address for obj in objects}
+            fetch_coordinates_batch(settings.YANDEX_GEOCODER_KEY, addresses, max_workers=options['workers'])
+            locations = dict(
+                Location.objects
+                    .filter(normalized_address__in={normalize_address(address) for address in addresses})
+                    .order_by('-id')
+                    .values_list('normalized_address', 'id')
+            )
+
+            located_objects = []
+            for obj in objects:
+                obj.location_id = locations.get(normalize_address(obj.address))
+                if obj.location_id:
+                    located_objects.append(obj)
+            model.objects.bulk_update(located_objects, ['location'], batch_size=500)
+
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: привязано {len(located_objects)} из {len(objects)}'
+            )
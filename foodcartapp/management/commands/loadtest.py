@@ -0,0 +1,190 @@
+import json
+import os
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from coordinates.geocoder_stub import start_geocoder_stub
+from foodcartapp.models import Product
+from foodcartapp.order_processing import process_pending_order_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер API и страницы заказов менеджера. Геокодер подменяется локальной заглушкой. '
+        'Заказы, созданные во время замера, остаются в базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='сколько запросов отправить к каждому адресу')
+        parser.add_argument('--concurrency', type=int, default=4, help='сколько потоков отправляют запросы')
+        parser.add_argument('--base-url', default=None,
+                            help='адрес запущенного сервера, например http://127.0.0.1:8000. '
+                                 'По умолчанию запросы обрабатываются внутри процесса и считаются запросы к базе')
+        parser.add_argument('--manager', default=None,
+                            help='логин сотрудника для замера /manager/orders/, только без --base-url')
+        parser.add_argument('--endpoints', nargs='+', default=['products', 'banners', 'order', 'manager_orders'],
+                            choices=['products', 'banners', 'order', 'manager_orders'])
+        parser.add_argument('--output', default=None,
+                            help='куда сохранить результаты в JSON, по умолчанию loadtest-results/<дата>-<коммит>.json')
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.available().values_list('id', flat=True)[:5])
+        if 'order' in options['endpoints'] and not product_ids:
+            raise CommandError('В базе нет доступных товаров, создайте их, например, командой generate_fixtures')
+        order_payload = json.dumps({
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, ул. Тверская, д. 1',
+            'products': [{'product': product_id, 'quantity': 1} for product_id in product_ids],
+        })
+        endpoints = {
+            'products': ('GET', '/api/products/', None),
+            'banners': ('GET', '/api/banners/', None),
+            'order': ('POST', '/api/order/', order_payload),
+            'manager_orders': ('GET', '/manager/orders/', None),
+        }
+
+        manager = None
+        if 'manager_orders' in options['endpoints']:
+            if options['base_url'] or not options['manager']:
+                self.stderr.write('/manager/orders/ пропущен: нужен --manager и запуск без --base-url')
+                options['endpoints'].remove('manager_orders')
+            else:
+                manager = get_user_model().objects.get(username=options['manager'])
+
+        geocoder = start_geocoder_stub()
+        results = {}
+        with override_settings(YANDEX_GEOCODER_URL=geocoder.url, ALLOWED_HOSTS=['*']):
+            for name in options['endpoints']:
+                method, path, body = endpoints[name]
+                measurements = self.run_endpoint(method, path, body, manager, options)
+                results[name] = self.summarize(path, measurements)
+                self.print_summary(name, results[name])
+            if 'order' in options['endpoints']:
+                results['order_processing'] = self.process_orders()
+                self.stdout.write(
+                    f'order_processing обработано {results["order_processing"]["tasks"]} заказов '
+                    f'за {results["order_processing"]["duration_ms"]} мс'
+                )
+        geocoder.shutdown()
+
+        report = {
+            'started_at': datetime.now().isoformat(),
+            'commit': self.get_commit(),
+            'base_url': options['base_url'],
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'geocoder_requests': len(geocoder.requested_addresses),
+            'endpoints': results,
+        }
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'loadtest-results', f'{datetime.now():%Y%m%d-%H%M%S}-{report["commit"]}.json',
+        )
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты сохранены в {output}')
+
+    def run_endpoint(self, method, path, body, manager, options):
+        def send_requests(requests_count):
+            if options['base_url']:
+                session = requests.Session()
+                send = lambda: session.request(  # noqa: E731
+                    method, options['base_url'] + path, data=body,
+                    headers={'Content-Type': 'application/json'},
+                ).status_code
+            else:
+                client = Client(raise_request_exception=False)
+                if manager:
+                    client.force_login(manager)
+                send = lambda: client.generic(  # noqa: E731
+                    method, path, body or '', content_type='application/json',
+                ).status_code
+
+            measurements = []
+            try:
+                for _ in range(requests_count):
+                    with CaptureQueriesContext(connection) as queries:
+                        started_at = time.perf_counter()
+                        status_code = send()
+                        duration = time.perf_counter() - started_at
+                    measurements.append((duration, status_code, None if options['base_url'] else len(queries)))
+            finally:
+                connection.close()
+            return measurements
+
+        concurrency = options['concurrency']
+        requests_per_thread = [
+            options['requests'] // concurrency + (thread < options['requests'] % concurrency)
+            for thread in range(concurrency)
+        ]
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            thread_measurements = list(executor.map(send_requests, requests_per_thread))
+        elapsed = time.perf_counter() - started_at
+        return elapsed, [measurement for measurements in thread_measurements for measurement in measurements]
+
+    @staticmethod
+    def process_orders():
+        """Обрабатывает очередь созданных заказов, координаты при этом запрашиваются у заглушки геокодера"""
+        tasks_count = 0
+        started_at = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            while True:
+                taken, _ = process_pending_order_tasks()
+                if not taken:
+                    break
+                tasks_count += taken
+        return {
+            'tasks': tasks_count,
+            'duration_ms': round((time.perf_counter() - started_at) * 1000, 2),
+            'queries': len(queries),
+        }
+
+    @staticmethod
+    def summarize(path, measurements):
+        elapsed, measurements = measurements
+        durations = sorted(duration * 1000 for duration, _, _ in measurements)
+        percentiles = statistics.quantiles(durations, n=100, method='inclusive') if len(durations) > 1 else durations * 99
+        query_counts = [queries for _, _, queries in measurements if queries is not None]
+        return {
+            'path': path,
+            'requests': len(measurements),
+            'errors': sum(1 for _, status_code, _ in measurements if status_code >= 400),
+            'rps': round(len(measurements) / elapsed, 2),
+            'p50_ms': round(percentiles[49], 2),
+            'p95_ms': round(percentiles[94], 2),
+            'p99_ms': round(percentiles[98], 2),
+            'queries_avg': round(statistics.mean(query_counts), 2) if query_counts else None,
+            'queries_max': max(query_counts) if query_counts else None,
+        }
+
+    def print_summary(self, name, summary):
+        queries = f', запросов к БД {summary["queries_avg"]} (макс. {summary["queries_max"]})' \
+            if summary['queries_avg'] is not None else ''
+        self.stdout.write(
+            f'{name:15} {summary["rps"]:8.1f} rps, p50 {summary["p50_ms"]} мс, p95 {summary["p95_ms"]} мс, '
+            f'p99 {summary["p99_ms"]} мс, ошибок {summary["errors"]}{queries}'
+        )
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return 'unknown'
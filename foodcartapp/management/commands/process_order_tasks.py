@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.order_processing import process_pending_order_tasks
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь новых заказов: геокодирует адреса и подбирает рестораны'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='сколько задач забирать из очереди за раз')
+        parser.add_argument('--sleep', type=float, default=1,
+                            help='пауза в секундах, если очередь пуста')
+        parser.add_argument('--once', action='store_true',
+                            help='разобрать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                taken_count, done_count = process_pending_order_tasks(options['batch_size'])
+            except Exception as error:
+                if options['once']:
+                    raise
+                # например, база недоступна: ждем и пробуем снова, а не завершаем обработчик
+                self.stderr.write(f'Ошибка обработки очереди: {error}')
+                time.sleep(options['sleep'])
+                continue
+            if taken_count:
+                self.stdout.write(f'Обработано заказов: {done_count} из {taken_count}')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from star_burger.profiling import make_profiling_token
+
+
+class Command(BaseCommand):
+    help = 'Выдает токен для параметра ?profile=, с которым запрос сотрудника профилируется'
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_profiling_token())
@@ -0,0 +1,49 @@
+import glob
+import io
+import os
+import pstats
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from star_burger.profiling import get_profiles_dir
+
+
+class Command(BaseCommand):
+    help = 'Сводит профили запросов из PROFILING_DIR и печатает самые затратные функции'
+
+    def add_arguments(self, parser):
+        parser.add_argument('views', nargs='*',
+                            help='имена view, например restaurateur:view_orders. По умолчанию все')
+        parser.add_argument('--sort', default='cumulative', help='порядок сортировки pstats')
+        parser.add_argument('--limit', type=int, default=30, help='сколько функций показать')
+        parser.add_argument('--output', default=None, help='сохранить сводный профиль в .prof-файл')
+
+    def handle(self, *args, **options):
+        if options['views']:
+            profiles_dirs = [get_profiles_dir(view_name) for view_name in options['views']]
+        else:
+            profiles_dirs = sorted(glob.glob(os.path.join(settings.PROFILING_DIR, '*')))
+
+        profiles_by_dir = {
+            profiles_dir: sorted(glob.glob(os.path.join(profiles_dir, '*.prof')))
+            for profiles_dir in profiles_dirs
+        }
+        profiles_by_dir = {profiles_dir: profiles for profiles_dir, profiles in profiles_by_dir.items() if profiles}
+        if not profiles_by_dir:
+            raise CommandError(f'В {settings.PROFILING_DIR} нет подходящих профилей')
+
+        for profiles_dir, profiles in profiles_by_dir.items():
+            view_dir_name = os.path.basename(profiles_dir)
+            self.stdout.write(f'{view_dir_name}: профилей {len(profiles)}')
+            report = io.StringIO()
+            stats = pstats.Stats(*profiles, stream=report)
+            stats.sort_stats(options['sort']).print_stats(options['limit'])
+            self.stdout.write(report.getvalue())
+
+            if options['output']:
+                output = options['output']
+                if len(profiles_by_dir) > 1:
+                    output = f'{os.path.splitext(output)[0]}-{view_dir_name}.prof'
+                stats.dump_stats(output)
+                self.stdout.write(f'Сводный профиль сохранен в {output}')
@@ -0,0 +1,127 @@
+"""Меню ресторанов: что каждый ресторан может приготовить прямо сейчас.
+
+Меню строятся одним запросом к RestaurantMenuItem и кэшируются по ресторанам в кэше каталога,
+если он задан в CATALOG_CACHE_ALIAS. Ключи меню содержат версию ресторана, которая меняется при
+изменении его самого, его пунктов меню и товаров в них (см. signals.py). Поэтому меню, которое
+запрос прочитал из базы до коммита изменений и записал в кэш после, ляжет под старую версию
+и отдаваться больше не будет.
+"""
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+
+from .catalog import get_catalog_cache
+from .models import Restaurant, RestaurantMenuItem
+
+ALL_MENUS_VERSION_KEY = 'restaurant_menus:version:all'
+
+
+def get_menu_version_key(restaurant_id):
+    return f'restaurant_menus:version:{restaurant_id}'
+
+
+def get_menu_version(cache, version_key):
+    version = cache.get(version_key)
+    if version is None:
+        # версии еще нет: берем ту, что успел сохранить параллельный запрос, или свою
+        cache.add(version_key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def get_all_menus_key(cache):
+    return f'restaurant_menus:all:{get_menu_version(cache, ALL_MENUS_VERSION_KEY)}'
+
+
+def get_menu_key(cache, restaurant_id):
+    return f'restaurant_menus:{restaurant_id}:{get_menu_version(cache, get_menu_version_key(restaurant_id))}'
+
+
+def dump_menu_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+    }
+
+
+def dump_restaurant_menus(restaurant_ids=None):
+    """Возвращает словарь id ресторана -> ресторан с меню из товаров, которые есть в продаже.
+
+    Рестораны, в меню которых ничего нет в продаже, в результат не попадают.
+    """
+    menu_items = (
+        RestaurantMenuItem.objects
+            .filter(availability=True)
+            .select_related('restaurant', 'product__category')
+            .order_by('restaurant_id', 'product_id')
+    )
+    if restaurant_ids is not None:
+        menu_items = menu_items.filter(restaurant_id__in=restaurant_ids)
+
+    restaurants = {}
+    menus = defaultdict(list)
+    for menu_item in menu_items:
+        restaurant = menu_item.restaurant
+        restaurants.setdefault(restaurant.id, {
+            'id': restaurant.id,
+            'name': restaurant.name,
+            'address': restaurant.address,
+            'menu': menus[restaurant.id],
+        })
+        menus[restaurant.id].append(dump_menu_product(menu_item.product))
+    return restaurants
+
+
+def dump_restaurant_menu(restaurant_id):
+    restaurant_menu = dump_restaurant_menus([restaurant_id]).get(restaurant_id)
+    if restaurant_menu is None:
+        restaurant = Restaurant.objects.filter(id=restaurant_id).first()
+        if not restaurant:
+            return None
+        restaurant_menu = {'id': restaurant.id, 'name': restaurant.name, 'address': restaurant.address, 'menu': []}
+    return restaurant_menu
+
+
+def get_restaurant_menus():
+    cache = get_catalog_cache()
+    if cache is None:
+        return list(dump_restaurant_menus().values())
+    key = get_all_menus_key(cache)
+    restaurants = cache.get(key)
+    if restaurants is None:
+        restaurants = list(dump_restaurant_menus().values())
+        cache.set(key, restaurants, timeout=settings.CATALOG_CACHE_TTL)
+    return restaurants
+
+
+def get_restaurant_menu(restaurant_id):
+    """Возвращает ресторан с меню или None, если такого ресторана нет"""
+    cache = get_catalog_cache()
+    if cache is None:
+        return dump_restaurant_menu(restaurant_id)
+    key = get_menu_key(cache, restaurant_id)
+    restaurant_menu = cache.get(key)
+    if restaurant_menu is None:
+        restaurant_menu = dump_restaurant_menu(restaurant_id)
+        if restaurant_menu is None:
+            return None
+        cache.set(key, restaurant_menu, timeout=settings.CATALOG_CACHE_TTL)
+    return restaurant_menu
+
+
+def invalidate_restaurant_menus(restaurant_ids):
+    """Меняет версии меню ресторанов и общего списка меню, закэшированные меню со старыми версиями не используются"""
+    cache = get_catalog_cache()
+    if cache is None:
+        return
+    version_keys = [ALL_MENUS_VERSION_KEY] + [get_menu_version_key(restaurant_id) for restaurant_id in restaurant_ids]
+    cache.set_many({version_key: uuid.uuid4().hex for version_key in version_keys}, timeout=None)
@@ -0,0 +1,25 @@
+# Generated by Django 3.2 on 2026-10-18 18:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0001_initial'),
+        ('foodcartapp', '0053_alter_order_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='location',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='coordinates.location', verbose_name='координаты'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='location',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='restaurants', to='coordinates.location', verbose_name='координаты'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2 on 2026-10-18 18:44
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_locations(apps, schema_editor):
+    Location = apps.get_model('coordinates', 'Location')
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    Order = apps.get_model('foodcartapp', 'Order')
+
+    for model in (Restaurant, Order):
+        location_id = Location.objects.filter(address=OuterRef('address')).values('id')[:1]
+        model.objects.filter(location__isnull=True).update(location=Subquery(location_id))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coordinates', '0001_initial'),
+        ('foodcartapp', '0054_order_location_restaurant_location'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_locations, migrations.RunPython.noop),
+    ]
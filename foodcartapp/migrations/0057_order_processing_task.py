@@ -0,0 +1,51 @@
+# Generated by Django 3.2 on 2026-10-18 18:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0056_order_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderProcessingTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Ожидает'), ('DONE', 'Выполнена'), ('FAILED', 'Ошибка')], default='PENDING', max_length=15, verbose_name='статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='дата создания')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='выполнить после')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='дата выполнения')),
+                ('error', models.TextField(blank=True, verbose_name='ошибка')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='processing_tasks', to='foodcartapp.order', verbose_name='заказ')),
+            ],
+            options={
+                'verbose_name': 'задача обработки заказа',
+                'verbose_name_plural': 'задачи обработки заказов',
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderCandidateRestaurant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(blank=True, null=True, verbose_name='расстояние, км')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_restaurants', to='foodcartapp.order', verbose_name='заказ')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_orders', to='foodcartapp.restaurant', verbose_name='ресторан')),
+            ],
+            options={
+                'verbose_name': 'подходящий ресторан',
+                'verbose_name_plural': 'подходящие рестораны',
+                'ordering': ['order', django.db.models.expressions.OrderBy(django.db.models.expressions.F('distance'), nulls_last=True)],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderprocessingtask',
+            index=models.Index(fields=['status', 'run_after'], name='order_task_status_run_idx'),
+        ),
+    ]
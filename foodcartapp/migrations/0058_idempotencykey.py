@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 18:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0057_order_processing_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True, verbose_name='ключ')),
+                ('response_data', models.JSONField(verbose_name='ответ')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='код ответа')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='дата создания')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='действует до')),
+            ],
+            options={
+                'verbose_name': 'ключ идемпотентности',
+                'verbose_name_plural': 'ключи идемпотентности',
+            },
+        ),
+    ]
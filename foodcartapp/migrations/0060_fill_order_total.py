@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 18:52
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_order_total(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderItem = apps.get_model('foodcartapp', 'OrderItem')
+    order_sum = (
+        OrderItem.objects
+            .filter(order=OuterRef('pk'))
+            .values('order')
+            .annotate(order_sum=Sum(F('quantity') * F('price')))
+            .values('order_sum')
+    )
+    Order.objects.update(total=Coalesce(Subquery(order_sum), Value(0), output_field=models.DecimalField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0059_order_total'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_order_total, migrations.RunPython.noop),
+    ]
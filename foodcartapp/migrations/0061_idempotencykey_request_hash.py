@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_fill_order_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='request_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='хэш запроса'),
+        ),
+    ]
@@ -1,10 +1,19 @@
+from collections import defaultdict
+
+import numpy as np
+import requests
+from django.conf import settings
 from django.db import models
-from django.db.models import Sum, F
+from django.db.models import Exists, F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
-from geopy import distance
-from coordinates.geocoder_functions import get_address_coordinates, Location
+from coordinates.distances import calculate_distances
+from coordinates.geocoder_functions import get_location
+from coordinates.models import Location
+from coordinates.normalization import normalize_address
+from .restaurants_index import get_restaurants_index
 
 
 class Restaurant(models.Model):
@@ -22,6 +31,15 @@ class Restaurant(models.Model):
         max_length=50,
         blank=True,
     )
+    location = models.ForeignKey(
+        Location,
+        verbose_name='координаты',
+        related_name='restaurants',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+    )
 
     class Meta:
         verbose_name = 'ресторан'
@@ -30,6 +48,10 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.location = locate_address(self.address, self.location)
+        super().save(*args, **kwargs)
+
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
@@ -129,50 +151,196 @@ class RestaurantMenuItem(models.Model):
 
 
 class OrderQuerySet(models.QuerySet):
-    def calculate_order_sum(self):
-        orders = self.prefetch_related('items').annotate(order_sum=Sum(F('items__quantity') * F('items__price')))
+    def update_totals(self):
+        """Пересчитывает сохраненные суммы заказов по их позициям"""
+        order_sum = (
+            OrderItem.objects
+                .filter(order=OuterRef('pk'))
+                .values('order')
+                .annotate(order_sum=Sum(F('quantity') * F('price')))
+                .values('order_sum')
+        )
+        return self.update(total=Coalesce(Subquery(order_sum), Value(0), output_field=models.DecimalField()))
+
+    def include_available_restaurants(self, limit=None):
+        """Добавляет заказам список ресторанов, способных их приготовить, с расстояниями до них.
+
+        Если передан limit, для каждого заказа ищутся только limit ближайших ресторанов.
+        """
+        orders = self.select_related('location').prefetch_related('items')
+        attach_available_restaurants(orders, limit)
         return orders
 
-    def include_available_restaurants(self):
-        menu_items = RestaurantMenuItem.objects.select_related('restaurant').filter(availability=True)
-        orders = self.prefetch_related('items')
+    def include_candidate_restaurants(self, limit=None):
+        """Добавляет заказам рестораны, которые подобрал фоновый обработчик (см. order_processing.py).
+
+        Заказам, которые обработчик еще не обработал или должен обработать заново, рестораны
+        подбираются на лету, как в include_available_restaurants.
+        """
+        tasks = OrderProcessingTask.objects.filter(order=OuterRef('pk'))
+        orders = list(
+            self
+                .annotate(
+                    has_done_task=Exists(tasks.filter(status=OrderProcessingTask.DONE)),
+                    has_pending_task=Exists(tasks.filter(status=OrderProcessingTask.PENDING)),
+                )
+                .select_related('location')
+                .prefetch_related(
+                    'items',
+                    Prefetch('candidate_restaurants', queryset=OrderCandidateRestaurant.objects.select_related(
+                        'restaurant',
+                    )),
+                )
+        )
+        unprocessed_orders = []
+        for order in orders:
+            if not order.has_done_task or order.has_pending_task:
+                unprocessed_orders.append(order)
+            else:
+                order.restaurants = [
+                    (candidate.restaurant, candidate.distance) for candidate in order.candidate_restaurants.all()
+                ][:limit]
+                order.restaurants_count = len(order.restaurants)
+        attach_available_restaurants(unprocessed_orders, limit)
+        return orders
 
-        addresses = [order.address for order in orders]
-        addresses = addresses + [restaurant.address for restaurant in Restaurant.objects.all()]
 
-        locations = Location.objects.filter(address__in=set(addresses))
-        cache_of_coordinates = {location.address: (location.longitude, location.latitude) for location in locations}
+def attach_available_restaurants(orders, limit=None):
+    """Подбирает рестораны заказам с заранее загруженными location и items, см. include_available_restaurants"""
+    if not orders:
+        return
+    restaurants = Restaurant.objects.select_related('location').in_bulk()
+    product_restaurants = get_product_restaurants_index()
 
-        for order in orders:
-            order_restaurants = set()
-            restaurants_with_distance = []
-            restaurants_with_unknown_distance = []
-            order_address_coordinates, cache_of_coordinates = get_address_coordinates(order.address,
-                                                                                      cache_of_coordinates)
-
-            order_items = order.items.all()
-            for order_item in order_items:
-                item_restaurants = [menu_item.restaurant for menu_item in menu_items if
-                                    menu_item.product_id == order_item.product_id]
-                if order_restaurants:
-                    order_restaurants = order_restaurants & set(item_restaurants)
-                else:
-                    order_restaurants = set(item_restaurants)
-
-            for restaurant in order_restaurants:
-                restorant_coordinates, cache_of_coordinates = get_address_coordinates(restaurant.address,
-                                                                                      cache_of_coordinates)
-                if order_address_coordinates and restorant_coordinates:
-                    distance_to = round(distance.distance(restorant_coordinates, order_address_coordinates).km, 2)
-                    restaurants_with_distance.append((restaurant, distance_to))
-                else:
-                    restaurants_with_unknown_distance.append((restaurant, None))
-
-            order.restaurants = sorted(restaurants_with_distance, key=lambda item: item[1]) \
-                                + restaurants_with_unknown_distance
-            order.restaurants_count = len(order.restaurants)
+    orders_restaurant_ids = []
+    for order in orders:
+        order_product_ids = {order_item.product_id for order_item in order.items.all()}
+        orders_restaurant_ids.append(find_restaurants_with_products(product_restaurants, order_product_ids))
 
-        return orders
+    if limit is None:
+        orders_restaurants_with_distance = rank_restaurants(orders, restaurants, orders_restaurant_ids)
+    else:
+        orders_restaurants_with_distance = find_nearest_restaurants(
+            orders, restaurants, orders_restaurant_ids, limit,
+        )
+
+    for order, order_restaurant_ids, restaurants_with_distance in zip(
+            orders, orders_restaurant_ids, orders_restaurants_with_distance):
+        known_restaurants = {restaurant.id for restaurant, _ in restaurants_with_distance}
+        restaurants_with_unknown_distance = [
+            (restaurants[restaurant_id], None)
+            for restaurant_id in order_restaurant_ids if restaurant_id not in known_restaurants
+        ]
+
+        order.restaurants = restaurants_with_distance + restaurants_with_unknown_distance
+        if limit is not None:
+            order.restaurants = order.restaurants[:limit]
+        order.restaurants_count = len(order.restaurants)
+
+
+def rank_restaurants(orders, restaurants, orders_restaurant_ids):
+    """Сортирует все подходящие рестораны по расстоянию до заказов одной матрицей расстояний"""
+    located_orders = [row for row, order in enumerate(orders) if is_located(order.location)]
+    located_restaurants = [
+        restaurant.id for restaurant in restaurants.values() if is_located(restaurant.location)
+    ]
+    located_restaurant_columns = {restaurant_id: column for column, restaurant_id in enumerate(located_restaurants)}
+
+    capability = np.zeros((len(located_orders), len(located_restaurants)), dtype=bool)
+    for row, order_row in enumerate(located_orders):
+        columns = [
+            located_restaurant_columns[restaurant_id]
+            for restaurant_id in orders_restaurant_ids[order_row] if restaurant_id in located_restaurant_columns
+        ]
+        capability[row, columns] = True
+
+    distances = calculate_distances(
+        [orders[row].location.coordinates for row in located_orders],
+        [restaurants[restaurant_id].location.coordinates for restaurant_id in located_restaurants],
+        method=settings.DISTANCE_CALCULATION_METHOD,
+    )
+    distances = np.round(np.where(capability, distances, np.inf), 2)
+    nearest_columns = np.argsort(distances, axis=1, kind='stable')
+    capable_counts = capability.sum(axis=1)
+
+    orders_restaurants_with_distance = [[] for _ in orders]
+    for row, order_row in enumerate(located_orders):
+        orders_restaurants_with_distance[order_row] = [
+            (restaurants[located_restaurants[column]], float(distances[row, column]))
+            for column in nearest_columns[row, :capable_counts[row]]
+        ]
+    return orders_restaurants_with_distance
+
+
+def find_nearest_restaurants(orders, restaurants, orders_restaurant_ids, limit):
+    """Находит для каждого заказа не больше limit ближайших подходящих ресторанов по пространственному индексу"""
+    restaurants_index = get_restaurants_index(restaurants.values())
+    orders_restaurants_with_distance = []
+    for order, order_restaurant_ids in zip(orders, orders_restaurant_ids):
+        if not is_located(order.location) or not order_restaurant_ids:
+            orders_restaurants_with_distance.append([])
+            continue
+
+        nearest = restaurants_index.nearest(*order.location.coordinates, limit, allowed_keys=order_restaurant_ids)
+        nearest_ids = [restaurant_id for restaurant_id, _ in nearest]
+        distances = calculate_distances(
+            [order.location.coordinates],
+            [restaurants[restaurant_id].location.coordinates for restaurant_id in nearest_ids],
+            method=settings.DISTANCE_CALCULATION_METHOD,
+        )
+        distances = np.round(distances[0], 2)
+        orders_restaurants_with_distance.append([
+            (restaurants[nearest_ids[column]], float(distances[column]))
+            for column in np.argsort(distances, kind='stable')
+        ])
+    return orders_restaurants_with_distance
+
+
+def is_located(location):
+    return location is not None and location.is_found
+
+
+def is_address_located(address, location):
+    if location is None:
+        return False
+    # у мест, сохраненных до появления normalized_address, поле может быть еще не заполнено
+    return (location.normalized_address or normalize_address(location.address)) == normalize_address(address)
+
+
+def locate_address(address, location):
+    """Возвращает место для адреса: текущее, если адрес не менялся, иначе найденное геокодером"""
+    if is_address_located(address, location):
+        return location
+    try:
+        return get_location(settings.YANDEX_GEOCODER_KEY, address)
+    except requests.RequestException:
+        return None
+
+
+def get_product_restaurants_index():
+    """Индекс доступности: id товара -> множество id ресторанов, где он есть в продаже"""
+    product_restaurants = defaultdict(set)
+    menu_items = RestaurantMenuItem.objects.filter(availability=True).values_list('product_id', 'restaurant_id')
+    for product_id, restaurant_id in menu_items:
+        product_restaurants[product_id].add(restaurant_id)
+    return {product_id: frozenset(restaurant_ids) for product_id, restaurant_ids in product_restaurants.items()}
+
+
+def find_restaurants_with_products(product_restaurants, product_ids):
+    """Возвращает id ресторанов, которые могут приготовить все товары из product_ids"""
+    if not product_ids:
+        return frozenset()
+    restaurant_sets = sorted(
+        (product_restaurants.get(product_id, frozenset()) for product_id in product_ids),
+        key=len,
+    )
+    # пересечение начинаем с самого маленького множества, чтобы быстрее дойти до пустого результата
+    restaurant_ids = restaurant_sets[0]
+    for restaurant_set in restaurant_sets[1:]:
+        if not restaurant_ids:
+            break
+        restaurant_ids = restaurant_ids & restaurant_set
+    return restaurant_ids
 
 
 class Order(models.Model):
@@ -200,16 +368,38 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=15, choices=ORDER_PAYMENT_METHOD_CHOICES, blank=False,
                                       default='UNDEFINED', verbose_name='Способ оплаты')
     comment = models.TextField('комментарий', blank=True)
+    total = models.DecimalField('сумма', max_digits=10, decimal_places=2, default=0,
+                                validators=[MinValueValidator(0)], editable=False)
     restaurant = models.ForeignKey(Restaurant, on_delete=models.SET_NULL, verbose_name='ресторан',
                                    related_name='orders', blank=True, null=True)
+    location = models.ForeignKey(Location, on_delete=models.SET_NULL, verbose_name='координаты',
+                                 related_name='orders', blank=True, null=True, editable=False)
     objects = OrderQuerySet.as_manager()
 
     def __str__(self):
         return f'№{self.id} - {self.lastname} {self.phonenumber}'
 
+    def save(self, *args, **kwargs):
+        # координаты заказа ищет фоновый обработчик, чтобы не задерживать оформление заказа
+        address_changed = not is_address_located(self.address, self.location)
+        if address_changed:
+            self.location = None
+        # задача, которую обработчик уже взял, геокодирует прежний адрес, поэтому новый адрес ставим в очередь всегда
+        address_edited = address_changed and (
+            self._state.adding or not Order.objects.filter(pk=self.pk, address=self.address).exists()
+        )
+        super().save(*args, **kwargs)
+        if not address_changed or not normalize_address(self.address):
+            return
+        if address_edited or not self.processing_tasks.filter(status=OrderProcessingTask.PENDING).exists():
+            OrderProcessingTask.objects.create(order=self)
+
     class Meta():
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_at_id_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -225,3 +415,67 @@ class OrderItem(models.Model):
     class Meta():
         verbose_name = 'пункт заказа'
         verbose_name_plural = 'пункты заказа'
+
+
+class OrderCandidateRestaurant(models.Model):
+    """Ресторан, который может приготовить заказ, найденный фоновым обработчиком"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='candidate_restaurants',
+                              verbose_name='заказ')
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='candidate_orders',
+                                   verbose_name='ресторан')
+    distance = models.FloatField('расстояние, км', blank=True, null=True)
+
+    def __str__(self):
+        return f'заказ {self.order_id} - {self.restaurant}'
+
+    class Meta():
+        verbose_name = 'подходящий ресторан'
+        verbose_name_plural = 'подходящие рестораны'
+        ordering = ['order', F('distance').asc(nulls_last=True)]
+
+
+class OrderProcessingTask(models.Model):
+    """Задача фоновой обработки заказа: геокодирование адреса, подбор ресторанов и пересчет суммы"""
+    PENDING = 'PENDING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Ожидает'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='processing_tasks', verbose_name='заказ')
+    status = models.CharField('статус', max_length=15, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField('попыток', default=0)
+    created_at = models.DateTimeField('дата создания', default=timezone.now)
+    run_after = models.DateTimeField('выполнить после', default=timezone.now)
+    finished_at = models.DateTimeField('дата выполнения', blank=True, null=True)
+    error = models.TextField('ошибка', blank=True)
+
+    def __str__(self):
+        return f'заказ {self.order_id} - {self.get_status_display()}'
+
+    class Meta():
+        verbose_name = 'задача обработки заказа'
+        verbose_name_plural = 'задачи обработки заказов'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='order_task_status_run_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """Ответ на запрос с заголовком Idempotency-Key, который вернется на повтор этого запроса"""
+    key = models.CharField('ключ', max_length=255, unique=True)
+    request_hash = models.CharField('хэш запроса', max_length=64, blank=True)
+    response_data = models.JSONField('ответ')
+    status_code = models.PositiveSmallIntegerField('код ответа')
+    created_at = models.DateTimeField('дата создания', default=timezone.now)
+    expires_at = models.DateTimeField('действует до', db_index=True)
+
+    def __str__(self):
+        return self.key
+
+    class Meta():
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
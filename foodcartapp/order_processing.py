@@ -0,0 +1,121 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from coordinates.geocoder_functions import fetch_coordinates_batch
+from coordinates.models import Location
+from coordinates.normalization import normalize_address
+from .models import Order, OrderCandidateRestaurant, OrderProcessingTask
+
+logger = logging.getLogger(__name__)
+
+
+def get_order_locations(orders):
+    """Возвращает словарь id заказа -> id места его адреса. Геокодер не вызывается, места ищутся только в базе"""
+    normalized_addresses = {order.id: normalize_address(order.address) for order in orders}
+    locations = dict(
+        Location.objects
+            .filter(normalized_address__in=set(normalized_addresses.values()))
+            .order_by('-id')
+            .values_list('normalized_address', 'id')
+    )
+    return {
+        order_id: locations[normalized_address]
+        for order_id, normalized_address in normalized_addresses.items()
+        if normalized_address in locations
+    }
+
+
+def fail_task(task, error):
+    """Возвращает задачу в очередь с растущей задержкой или, если попытки кончились, помечает ее ошибкой"""
+    task.attempts += 1
+    task.error = f'{type(error).__name__}: {error}'
+    if task.attempts >= settings.ORDER_PROCESSING_MAX_ATTEMPTS:
+        task.status = OrderProcessingTask.FAILED
+    else:
+        task.run_after = timezone.now() + timedelta(minutes=2 ** task.attempts)
+    task.save(update_fields=['attempts', 'error', 'status', 'run_after'])
+
+
+def find_candidate_restaurants(order_ids):
+    orders = Order.objects.filter(id__in=order_ids).include_available_restaurants(
+        limit=settings.ORDER_BOARD_RESTAURANTS_LIMIT,
+    )
+    OrderCandidateRestaurant.objects.filter(order_id__in=order_ids).delete()
+    OrderCandidateRestaurant.objects.bulk_create([
+        OrderCandidateRestaurant(order=order, restaurant=restaurant, distance=distance)
+        for order in orders
+        for restaurant, distance in order.restaurants
+    ])
+
+
+def process_order_tasks(tasks):
+    """Выполняет задачи обработки заказов, возвращает количество выполненных.
+
+    Любая ошибка задачи откатывается до точки сохранения и возвращает задачу в очередь, поэтому
+    одна сломанная задача не мешает остальным и не останавливает обработчик.
+    """
+    # адреса всех заказов геокодируются одной параллельной пачкой, повторно по одному их не запрашиваем
+    try:
+        with transaction.atomic():
+            fetch_coordinates_batch(settings.YANDEX_GEOCODER_KEY, [task.order.address for task in tasks])
+    except Exception:
+        logger.exception('Не удалось геокодировать адреса заказов')
+    order_locations = get_order_locations([task.order for task in tasks])
+
+    located_tasks = []
+    superseded_tasks = []
+    for task in tasks:
+        try:
+            with transaction.atomic():
+                location_id = order_locations.get(task.order_id)
+                if not location_id:
+                    raise LookupError(f'координаты адреса «{task.order.address}» не получены')
+                # пока задача выполнялась, адрес могли изменить: тогда заказ ждет новая задача с новым адресом
+                updated = Order.objects.filter(id=task.order_id, address=task.order.address).update(
+                    location=location_id,
+                )
+        except Exception as error:
+            fail_task(task, error)
+            continue
+        if updated:
+            located_tasks.append(task)
+        else:
+            superseded_tasks.append(task)
+
+    done_order_ids = [task.order_id for task in located_tasks]
+    try:
+        with transaction.atomic():
+            find_candidate_restaurants(done_order_ids)
+            Order.objects.filter(id__in=done_order_ids).update_totals()
+    except Exception as error:
+        for task in located_tasks:
+            fail_task(task, error)
+        return 0
+
+    OrderProcessingTask.objects.filter(id__in=[task.id for task in located_tasks + superseded_tasks]).update(
+        status=OrderProcessingTask.DONE,
+        finished_at=timezone.now(),
+        error='',
+    )
+    return len(located_tasks)
+
+
+def process_pending_order_tasks(batch_size=50):
+    """Забирает из очереди пачку готовых к выполнению задач и выполняет их.
+
+    Строки задач блокируются до конца обработки, параллельно запущенные обработчики их пропускают.
+    Задачи, которые не удалось выполнить, возвращаются в очередь с растущей задержкой.
+    """
+    with transaction.atomic():
+        tasks = list(
+            OrderProcessingTask.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .filter(status=OrderProcessingTask.PENDING, run_after__lte=timezone.now())
+                .select_related('order')
+                .order_by('run_after', 'id')[:batch_size]
+        )
+        return len(tasks), process_order_tasks(tasks)
@@ -0,0 +1,174 @@
+"""Быстрая проверка заказа без ModelSerializer.
+
+Повторяет правила и тексты ошибок OrderSerializer, но обходится простыми проверками словарей,
+одним запросом за всеми товарами и кэшем разобранных телефонных номеров.
+"""
+import re
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError
+from phonenumber_field.phonenumber import to_python
+from phonenumber_field.validators import validate_international_phonenumber
+from rest_framework import fields
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import ListSerializer, Serializer
+
+from .models import Order, Product
+
+DECIMAL_ZEROS_PATTERN = re.compile(r'\.0*\s*$')
+
+CHAR_FIELDS = {
+    field_name: Order._meta.get_field(field_name).max_length
+    for field_name in ['firstname', 'lastname', 'phonenumber', 'address']
+}
+MIN_QUANTITY = 1
+# верхняя граница SmallIntegerField: сериализатор ее не проверяет, и такое количество ломает вставку в базу
+MAX_QUANTITY = 32767
+
+
+def get_message(field_class, key, **kwargs):
+    return str(field_class.default_error_messages[key]).format(**kwargs)
+
+
+@lru_cache(maxsize=10000)
+def normalize_phonenumber(phonenumber):
+    """Разбирает номер телефона, возвращает (PhoneNumber, ошибка). Результаты разбора кэшируются"""
+    phone_number = to_python(phonenumber)
+    try:
+        validate_international_phonenumber(phone_number)
+    except ValidationError as error:
+        return None, error.messages[0]
+    return phone_number, None
+
+
+def validate_char(value, max_length):
+    """Проверяет строку так же, как CharField из DRF: возвращает (значение, ошибки)"""
+    if value is None:
+        return None, [get_message(fields.Field, 'null')]
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        return None, [get_message(fields.CharField, 'invalid')]
+    value = str(value).strip()
+    if not value:
+        return None, [get_message(fields.CharField, 'blank')]
+    if len(value) > max_length:
+        return None, [get_message(fields.CharField, 'max_length', max_length=max_length)]
+    return value, []
+
+
+def validate_integer(value, min_value=None, max_value=None):
+    """Проверяет целое число так же, как IntegerField из DRF: возвращает (значение, ошибки)"""
+    if value is None:
+        return None, [get_message(fields.Field, 'null')]
+    if isinstance(value, str) and len(value) > fields.IntegerField.MAX_STRING_LENGTH:
+        return None, [get_message(fields.IntegerField, 'max_string_length')]
+    try:
+        value = int(DECIMAL_ZEROS_PATTERN.sub('', str(value)))
+    except (ValueError, TypeError):
+        return None, [get_message(fields.IntegerField, 'invalid')]
+    if min_value is not None and value < min_value:
+        return None, [get_message(fields.IntegerField, 'min_value', min_value=min_value)]
+    if max_value is not None and value > max_value:
+        return None, [get_message(fields.IntegerField, 'max_value', max_value=max_value)]
+    return value, []
+
+
+def validate_order_items(items):
+    """Проверяет поля позиций заказа, возвращает (позиции, ошибки)"""
+    if not isinstance(items, list):
+        message = get_message(ListSerializer, 'not_a_list', input_type=type(items).__name__)
+        return None, {'non_field_errors': [message]}
+    if not items:
+        return None, {'non_field_errors': [get_message(ListSerializer, 'empty')]}
+
+    validated_items = []
+    items_errors = []
+    for item in items:
+        if not isinstance(item, dict):
+            message = get_message(Serializer, 'invalid', datatype=type(item).__name__)
+            items_errors.append({'non_field_errors': [message]})
+            continue
+
+        item_errors = {}
+        validated_item = {}
+        for field_name, min_value, max_value in [('product', None, None), ('quantity', MIN_QUANTITY, MAX_QUANTITY)]:
+            if field_name not in item:
+                item_errors[field_name] = [get_message(fields.Field, 'required')]
+                continue
+            value, errors = validate_integer(item[field_name], min_value, max_value)
+            if errors:
+                item_errors[field_name] = errors
+            validated_item[field_name] = value
+        items_errors.append(item_errors)
+        validated_items.append(validated_item)
+
+    if any(items_errors):
+        return None, items_errors
+    return validated_items, None
+
+
+def validate_order_payload(data, products=None):
+    """Проверяет данные заказа, возвращает (validated_data, errors) в формате OrderSerializer.
+
+    Если передан словарь products с товарами по id, товары из базы не запрашиваются.
+    """
+    if not isinstance(data, dict):
+        message = get_message(Serializer, 'invalid', datatype=type(data).__name__)
+        return None, {'non_field_errors': [message]}
+
+    validated_data = {}
+    errors = {}
+    for field_name, max_length in CHAR_FIELDS.items():
+        if field_name not in data:
+            errors[field_name] = [get_message(fields.Field, 'required')]
+            continue
+        value, field_errors = validate_char(data[field_name], max_length)
+        if not field_errors and field_name == 'phonenumber':
+            value, phonenumber_error = normalize_phonenumber(value)
+            if phonenumber_error:
+                field_errors = [phonenumber_error]
+        if field_errors:
+            errors[field_name] = field_errors
+        validated_data[field_name] = value
+
+    if 'products' not in data:
+        errors['products'] = [get_message(fields.Field, 'required')]
+    elif data['products'] is None:
+        errors['products'] = [get_message(fields.Field, 'null')]
+    else:
+        items, items_errors = validate_order_items(data['products'])
+        if not items_errors:
+            items, items_errors = attach_products(items, products)
+        if items_errors:
+            errors['products'] = items_errors
+        validated_data['items'] = items
+
+    if errors:
+        return None, errors
+    return validated_data, None
+
+
+def attach_products(items, products=None):
+    """Подставляет в позиции товары, найденные одним запросом. Используется и в OrderSerializer"""
+    if products is None:
+        products = Product.objects.in_bulk({item['product'] for item in items})
+
+    items_errors = []
+    for item in items:
+        if item['product'] in products:
+            items_errors.append({})
+        else:
+            message = get_message(PrimaryKeyRelatedField, 'does_not_exist', pk_value=item['product'])
+            items_errors.append({'product': [message]})
+    if any(items_errors):
+        return None, items_errors
+
+    return [{**item, 'product': products[item['product']]} for item in items], None
+
+
+def dump_order(order):
+    return {
+        'firstname': order.firstname,
+        'lastname': order.lastname,
+        'phonenumber': str(order.phonenumber),
+        'address': order.address,
+    }
@@ -0,0 +1,30 @@
+from django.conf import settings
+
+from coordinates.spatial_index import GridIndex
+
+# точки и построенный по ним индекс, меняются одним присваиванием, чтобы потоки не видели их вразнобой
+_restaurants_index = (None, None)
+
+
+def get_restaurants_index(restaurants):
+    """Возвращает пространственный индекс ресторанов с известными координатами.
+
+    Индекс хранится в памяти процесса и перестраивается, только если у ресторанов поменялись координаты,
+    например после смены адреса.
+    """
+    points = tuple(
+        (restaurant.id, restaurant.location.longitude, restaurant.location.latitude)
+        for restaurant in restaurants
+        if restaurant.location and restaurant.location.is_found
+    )
+    global _restaurants_index
+    indexed_points, index = _restaurants_index
+    if indexed_points != points:
+        index = GridIndex(points, cell_size=settings.RESTAURANTS_INDEX_CELL_SIZE)
+        _restaurants_index = (points, index)
+    return index
+
+
+def clear_restaurants_index():
+    global _restaurants_index
+    _restaurants_index = (None, None)
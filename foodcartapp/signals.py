@@ -0,0 +1,54 @@
+import threading
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog_snapshot import refresh_catalog
+from .menus import invalidate_restaurant_menus
+from .models import Product, ProductCategory, Restaurant, RestaurantMenuItem
+
+# id ресторанов, чьи меню изменились в незакоммиченных транзакциях, по алиасу базы
+_pending = threading.local()
+
+
+def get_pending_restaurant_ids(using):
+    if not hasattr(_pending, 'restaurant_ids'):
+        _pending.restaurant_ids = {}
+    return _pending.restaurant_ids.setdefault(using, set())
+
+
+def apply_catalog_changes(using):
+    """Сбрасывает кэш каталога и меню измененных ресторанов после коммита.
+
+    Колбэк ставится на каждое изменение, но работу делает только первый выполненный в транзакции:
+    он забирает все накопленные id, остальные находят пустой набор и ничего не делают.
+    """
+    restaurant_ids = _pending.restaurant_ids.pop(using, None) if hasattr(_pending, 'restaurant_ids') else None
+    if restaurant_ids is None:
+        return
+    refresh_catalog()
+    invalidate_restaurant_menus(restaurant_ids)
+
+
+def get_changed_restaurant_ids(sender, instance):
+    if sender is RestaurantMenuItem:
+        return [instance.restaurant_id]
+    if sender is Restaurant:
+        return [instance.id]
+    if sender is Product:
+        # при удалении товара его пункты меню удалены раньше и сбросили свои меню сами
+        return list(instance.menu_items.values_list('restaurant_id', flat=True))
+    # у удаленной категории товары уже отвязаны, поэтому сбрасываем меню всех ресторанов
+    return list(Restaurant.objects.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductCategory)
+@receiver([post_save, post_delete], sender=Restaurant)
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def invalidate_catalog(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    get_pending_restaurant_ids(using).update(get_changed_restaurant_ids(sender, instance))
+    # до коммита параллельный запрос успел бы закэшировать старый каталог под новой версией
+    transaction.on_commit(partial(apply_catalog_changes, using), using=using)
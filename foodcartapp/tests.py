@@ -0,0 +1,630 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from coordinates.cache import coordinates_cache
+from coordinates.models import Location
+from .catalog import get_catalog_cache, get_catalog_version
+from .catalog_snapshot import write_file
+from .menus import dump_restaurant_menu, get_menu_key
+from .models import Order, OrderProcessingTask, Product, Restaurant, RestaurantMenuItem
+from .order_processing import process_order_tasks, process_pending_order_tasks
+from .order_validation import MAX_QUANTITY, validate_order_payload
+from .restaurants_index import clear_restaurants_index
+from .views import OrderSerializer
+
+
+def generate_fixtures(**sizes):
+    options = {f'--{name}={value}' for name, value in sizes.items()}
+    call_command('generate_fixtures', '--seed=1', *options, stdout=StringIO())
+
+
+def clear_process_caches():
+    """Сбрасывает общие для процесса кэши, чтобы число запросов не зависело от предыдущих тестов"""
+    for cache in caches.all():
+        cache.clear()
+    coordinates_cache.clear()
+    clear_restaurants_index()
+
+
+class QueryCountMixin:
+    """Число запросов к базе не должно зависеть от числа строк: проверяем на малом и на большом наборе данных"""
+    scales = [
+        {'restaurants': 3, 'products': 5, 'orders': 5},
+        {'restaurants': 20, 'products': 60, 'orders': 200},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        clear_process_caches()
+
+    def assertQueriesAtEveryScale(self, num, url):
+        for scale in self.scales:
+            generate_fixtures(**scale)
+            with self.subTest(url=url, **scale), self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+
+class QueryCountTest(QueryCountMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+
+    def test_product_list_api(self):
+        self.client.logout()
+        self.assertQueriesAtEveryScale(2, '/api/products/')
+
+    def test_order_changelist(self):
+        self.assertQueriesAtEveryScale(5, reverse('admin:foodcartapp_order_changelist'))
+
+    def test_product_changelist(self):
+        self.assertQueriesAtEveryScale(6, reverse('admin:foodcartapp_product_changelist'))
+
+    def test_restaurant_changelist(self):
+        self.assertQueriesAtEveryScale(5, reverse('admin:foodcartapp_restaurant_changelist'))
+
+    def test_category_changelist(self):
+        self.assertQueriesAtEveryScale(5, reverse('admin:foodcartapp_productcategory_changelist'))
+
+
+class OrderProcessingTest(TestCase):
+    def create_order(self, address):
+        return Order.objects.create(firstname='Иван', lastname='Петров', phonenumber='+79991234567', address=address)
+
+    @override_settings(YANDEX_GEOCODER_URL='http://127.0.0.1:9/', GEOCODER_TIMEOUT=0.5)
+    def test_failed_task_does_not_block_batch(self):
+        Location.objects.create(address='Москва, ул. Тверская, д. 1', longitude=37.6, latitude=55.7)
+        located_order = self.create_order('москва,  ул Тверская, д1')
+        unlocated_order = self.create_order('Москва, ул. Арбат, д. 10')
+
+        self.assertEqual(process_pending_order_tasks(), (2, 1))
+
+        located_order.refresh_from_db()
+        self.assertIsNotNone(located_order.location)
+        failed_task = unlocated_order.processing_tasks.get()
+        self.assertEqual(failed_task.status, OrderProcessingTask.PENDING)
+        self.assertEqual(failed_task.attempts, 1)
+        self.assertIn('LookupError', failed_task.error)
+        self.assertEqual(process_pending_order_tasks(), (0, 0))
+
+    @override_settings(YANDEX_GEOCODER_URL='http://127.0.0.1:9/', GEOCODER_TIMEOUT=0.5)
+    def test_address_changed_during_processing(self):
+        Location.objects.create(address='Москва, ул. Тверская, д. 1', longitude=37.6, latitude=55.7)
+        order = self.create_order('Москва, ул. Тверская, д. 1')
+        tasks = list(OrderProcessingTask.objects.select_related('order'))
+
+        order.address = 'Москва, ул. Арбат, д. 10'
+        order.save()
+        self.assertEqual(process_order_tasks(tasks), 0)
+
+        order.refresh_from_db()
+        self.assertIsNone(order.location)
+        self.assertEqual(order.processing_tasks.filter(status=OrderProcessingTask.PENDING).count(), 1)
+
+
+class IdempotencyKeyTest(TestCase):
+    def setUp(self):
+        generate_fixtures(restaurants=1, products=2, orders=0, **{'menu-share': 1})
+        self.order_data = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, ул. Тверская, д. 1',
+            'products': [{'product': Product.objects.first().id, 'quantity': 1}],
+        }
+
+    def post_order(self, order_data):
+        return self.client.post('/api/order/', order_data, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY='order-1')
+
+    def test_repeat_returns_stored_response(self):
+        response = self.post_order(self.order_data)
+        repeated_response = self.post_order(self.order_data)
+
+        self.assertEqual(repeated_response.status_code, 200)
+        self.assertEqual(repeated_response.json(), response.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_with_other_body(self):
+        self.post_order(self.order_data)
+        response = self.post_order({**self.order_data, 'address': 'Москва, ул. Арбат, д. 10'})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class RegisterOrderTest(TestCase):
+    def setUp(self):
+        generate_fixtures(restaurants=1, products=10, orders=0, **{'menu-share': 1})
+        self.products = list(Product.objects.order_by('id'))
+
+    def post_order(self, products):
+        return self.client.post('/api/order/', {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, ул. Тверская, д. 1',
+            'products': [{'product': product.id, 'quantity': 2} for product in products],
+        }, content_type='application/json')
+
+    def test_queries_do_not_depend_on_cart_size(self):
+        for fast_validation in (False, True):
+            queries_counts = []
+            for products in [self.products[:1], self.products]:
+                with override_settings(ORDER_FAST_VALIDATION=fast_validation), \
+                        CaptureQueriesContext(connection) as queries:
+                    response = self.post_order(products)
+                self.assertEqual(response.status_code, 200)
+                queries_counts.append(len(queries))
+
+            with self.subTest(fast_validation=fast_validation):
+                self.assertEqual(queries_counts[0], queries_counts[1])
+
+
+class OrderTotalTest(TestCase):
+    def setUp(self):
+        generate_fixtures(restaurants=1, products=3, orders=0, **{'menu-share': 1})
+        self.products = list(Product.objects.order_by('id'))
+        self.order_data = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, ул. Тверская, д. 1',
+            'products': [
+                {'product': self.products[0].id, 'quantity': 2},
+                {'product': self.products[1].id, 'quantity': 3},
+            ],
+        }
+        self.expected_total = self.products[0].price * 2 + self.products[1].price * 3
+
+    def test_created_by_api(self):
+        response = self.client.post('/api/order/', self.order_data, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get().total, self.expected_total)
+
+    def test_created_by_batch(self):
+        response = self.client.post('/api/orders/batch/', [self.order_data, self.order_data],
+                                    content_type='application/json')
+
+        order_ids = [result['id'] for result in response.json()]
+        totals = Order.objects.filter(id__in=order_ids).values_list('total', flat=True)
+        self.assertEqual(list(totals), [self.expected_total] * 2)
+
+    def test_update_totals(self):
+        self.client.post('/api/order/', self.order_data, content_type='application/json')
+        empty_order = Order.objects.create(firstname='Анна', lastname='Попова', phonenumber='+79991234568',
+                                           address='', total=100)
+        Order.objects.update(total=1)
+
+        Order.objects.update_totals()
+
+        self.assertEqual(Order.objects.exclude(id=empty_order.id).get().total, self.expected_total)
+        empty_order.refresh_from_db()
+        self.assertEqual(empty_order.total, 0)
+
+    def test_items_edited_in_admin(self):
+        self.client.post('/api/order/', self.order_data, content_type='application/json')
+        order = Order.objects.get()
+        first_item, second_item = order.items.order_by('id')
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:foodcartapp_order_change', args=(order.id,)), {
+            'firstname': order.firstname,
+            'lastname': order.lastname,
+            'phonenumber': str(order.phonenumber),
+            'address': order.address,
+            'created_at_0': order.created_at.strftime('%d.%m.%Y'),
+            'created_at_1': order.created_at.strftime('%H:%M:%S'),
+            'status': order.status,
+            'payment_method': order.payment_method,
+            'items-TOTAL_FORMS': 3,
+            'items-INITIAL_FORMS': 2,
+            'items-0-id': first_item.id,
+            'items-0-order': order.id,
+            'items-0-product': first_item.product_id,
+            'items-0-quantity': 5,
+            'items-0-price': first_item.price,
+            'items-1-id': second_item.id,
+            'items-1-order': order.id,
+            'items-1-product': second_item.product_id,
+            'items-1-quantity': second_item.quantity,
+            'items-1-price': second_item.price,
+            'items-1-DELETE': 'on',
+            'items-2-order': order.id,
+            'items-2-product': self.products[2].id,
+            'items-2-quantity': 1,
+            'items-2-price': '10.00',
+            'candidate_restaurants-TOTAL_FORMS': 0,
+            'candidate_restaurants-INITIAL_FORMS': 0,
+        })
+
+        self.assertEqual(response.status_code, 302)
+        order.refresh_from_db()
+        self.assertEqual(order.total, first_item.price * 5 + 10)
+
+
+class OrderBatchTest(TestCase):
+    def setUp(self):
+        generate_fixtures(restaurants=1, products=3, orders=0, **{'menu-share': 1})
+        self.products = list(Product.objects.order_by('id'))
+
+    def get_order_data(self, *products):
+        return {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, ул. Тверская, д. 1',
+            'products': [{'product': product_id, 'quantity': 1} for product_id in products],
+        }
+
+    def post_batch(self, orders_data):
+        return self.client.post('/api/orders/batch/', orders_data, content_type='application/json')
+
+    def test_mixed_batch(self):
+        response = self.post_batch([
+            self.get_order_data(self.products[0].id),
+            {**self.get_order_data(self.products[1].id), 'phonenumber': 'не телефон'},
+            self.get_order_data(0),
+            self.get_order_data(self.products[1].id, self.products[2].id),
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        created_orders = Order.objects.order_by('id')
+        self.assertEqual([result['created'] for result in results], [True, False, False, True])
+        self.assertEqual([results[0]['id'], results[3]['id']], [order.id for order in created_orders])
+        self.assertEqual(set(results[1]['errors']), {'phonenumber'})
+        self.assertEqual(results[2]['errors'], {
+            'products': [{'product': ['Недопустимый первичный ключ "0" - объект не существует.']}],
+        })
+        self.assertEqual(created_orders[1].items.count(), 2)
+
+    def test_invalid_body(self):
+        for orders_data in [[], {'orders': []}, json.dumps('заказ')]:
+            with self.subTest(orders_data=orders_data):
+                response = self.post_batch(orders_data)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('non_field_errors', response.json())
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(ORDERS_BATCH_MAX_SIZE=2)
+    def test_batch_size_limit(self):
+        response = self.post_batch([self.get_order_data(self.products[0].id)] * 3)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_one_products_query(self):
+        orders_data = [self.get_order_data(product.id) for product in self.products] * 5
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_batch(orders_data)
+
+        self.assertEqual(response.status_code, 200)
+        products_table = Product._meta.db_table
+        products_queries = [query for query in queries if f'FROM "{products_table}"' in query['sql']]
+        self.assertEqual(len(products_queries), 1)
+
+
+class OrderValidationParityTest(TestCase):
+    """Быстрый валидатор заказа должен возвращать те же данные и ошибки, что и OrderSerializer"""
+
+    def setUp(self):
+        generate_fixtures(restaurants=1, products=2, orders=0, **{'menu-share': 1})
+        product_id = Product.objects.first().id
+        self.order_data = {
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79991234567',
+            'address': 'Москва, ул. Тверская, д. 1',
+            'products': [{'product': product_id, 'quantity': 2}],
+        }
+
+    def validate_with_serializer(self, order_data):
+        serializer = OrderSerializer(data=order_data)
+        if serializer.is_valid():
+            return serializer.validated_data, None
+        return None, json.loads(json.dumps(serializer.errors))
+
+    def test_same_results(self):
+        item = self.order_data['products'][0]
+        cases = [
+            self.order_data,
+            {**self.order_data, 'phonenumber': '8 (999) 123-45-67', 'firstname': '  Иван  '},
+            {**self.order_data, 'products': [{**item, 'product': str(item['product']), 'quantity': '3.0'}]},
+            {},
+            [],
+            {**self.order_data, 'firstname': None, 'lastname': '', 'address': 'x' * 501, 'phonenumber': '123'},
+            {**self.order_data, 'firstname': ['Иван'], 'lastname': True},
+            {**self.order_data, 'products': None},
+            {**self.order_data, 'products': []},
+            {**self.order_data, 'products': 'товары'},
+            {**self.order_data, 'products': [item, 'товар', {}]},
+            {**self.order_data, 'products': [
+                {'product': 'x', 'quantity': 0},
+                {'product': item['product'], 'quantity': -1},
+            ]},
+            {**self.order_data, 'products': [item, {'product': 0, 'quantity': 1}]},
+        ]
+        for order_data in cases:
+            with self.subTest(order_data=order_data):
+                expected_data, expected_errors = self.validate_with_serializer(order_data)
+                validated_data, errors = validate_order_payload(order_data)
+
+                self.assertEqual(errors, expected_errors)
+                if expected_data is not None:
+                    self.assertEqual(validated_data, {
+                        **expected_data,
+                        'items': [dict(item) for item in expected_data['items']],
+                    })
+
+    def test_quantity_above_small_integer(self):
+        # единственное задуманное расхождение: сериализатор пропускает количество, которое не влезет в базу
+        item = {**self.order_data['products'][0], 'quantity': MAX_QUANTITY + 1}
+        order_data = {**self.order_data, 'products': [item]}
+
+        self.assertIsNone(self.validate_with_serializer(order_data)[1])
+        self.assertEqual(validate_order_payload(order_data)[1], {
+            'products': [{'quantity': [f'Убедитесь, что это значение меньше либо равно {MAX_QUANTITY}.']}],
+        })
+
+
+@override_settings(CATALOG_CACHE_ALIAS='default')
+class ProductListCacheTest(TestCase):
+    def setUp(self):
+        clear_process_caches()
+        generate_fixtures(restaurants=2, products=5, orders=0)
+
+    def test_not_modified_without_queries(self):
+        response = self.client.get('/api/products/')
+        with self.assertNumQueries(0):
+            cached_response = self.client.get('/api/products/')
+            not_modified_response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertTrue(not_modified_response.has_header('Last-Modified'))
+
+    def test_invalidated_on_catalog_change(self):
+        response = self.client.get('/api/products/')
+        product = Product.objects.available().first()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Новое название'
+            product.save()
+
+        changed_response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed_response.status_code, 200)
+        self.assertIn('Новое название', changed_response.content.decode())
+
+    def test_version_read_once_per_request(self):
+        with mock.patch('foodcartapp.views.get_catalog_version', wraps=get_catalog_version) as get_version:
+            response = self.client.get('/api/products/', {'limit': 2})
+
+        get_version.assert_called_once_with()
+        self.assertEqual(response['ETag'], f'"{get_catalog_version()["id"]}"')
+
+    def test_refreshed_once_per_transaction(self):
+        with mock.patch('foodcartapp.signals.refresh_catalog') as refresh_catalog, \
+                mock.patch('foodcartapp.signals.invalidate_restaurant_menus') as invalidate_restaurant_menus:
+            with self.captureOnCommitCallbacks(execute=True):
+                for menu_item in RestaurantMenuItem.objects.all():
+                    menu_item.availability = not menu_item.availability
+                    menu_item.save()
+
+            refresh_catalog.assert_called_once_with()
+            invalidate_restaurant_menus.assert_called_once_with(set(Restaurant.objects.values_list('id', flat=True)))
+
+    def test_rolled_back_changes_do_not_block_refresh(self):
+        product = Product.objects.available().first()
+        try:
+            with transaction.atomic():
+                product.save()
+                raise DatabaseError
+        except DatabaseError:
+            pass
+
+        with mock.patch('foodcartapp.signals.refresh_catalog') as refresh_catalog:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+            refresh_catalog.assert_called_once_with()
+
+    @override_settings(CATALOG_CACHE_ALIAS=None)
+    def test_not_cached_without_catalog_cache(self):
+        response = self.client.get('/api/products/')
+        Product.objects.available().update(name='Новое название')
+
+        changed_response = self.client.get('/api/products/')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('Новое название', changed_response.content.decode())
+
+
+class ProductListFiltersTest(TestCase):
+    def setUp(self):
+        generate_fixtures(restaurants=2, products=30, orders=0, **{'menu-share': 1})
+
+    def test_pages_cover_catalog(self):
+        all_products = self.client.get('/api/products/').json()
+        products = []
+        url = '/api/products/?limit=7&fields=name,price'
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url).json()
+            products += page['results']
+            url = page['next']
+
+        self.assertEqual(products, [
+            {'id': product['id'], 'name': product['name'], 'price': product['price']} for product in all_products
+        ])
+
+    def test_category_filter(self):
+        category_id = Product.objects.available().first().category_id
+        products = self.client.get('/api/products/', {'category': category_id, 'fields': 'category'}).json()
+
+        self.assertTrue(products)
+        self.assertTrue(all(product['category']['id'] == category_id for product in products))
+
+    def test_invalid_params(self):
+        response = self.client.get('/api/products/', {'fields': 'name,secret', 'cursor': 'x'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {
+            'fields': ['Неизвестные поля: secret'],
+            'cursor': ['Введите целое число.'],
+        })
+
+
+@override_settings(CATALOG_CACHE_ALIAS='default')
+class RestaurantMenuTest(TestCase):
+    def setUp(self):
+        clear_process_caches()
+        generate_fixtures(restaurants=3, products=10, orders=0)
+        self.restaurant, self.other_restaurant = Restaurant.objects.order_by('id')[:2]
+
+    def test_menu_lists_available_products(self):
+        with self.assertNumQueries(1):
+            menu = self.client.get(f'/api/restaurants/{self.restaurant.id}/menu/').json()
+
+        available_product_ids = set(
+            self.restaurant.menu_items.filter(availability=True).values_list('product_id', flat=True)
+        )
+        self.assertEqual({product['id'] for product in menu['menu']}, available_product_ids)
+        self.assertEqual(self.client.get('/api/restaurants/0/menu/').status_code, 404)
+
+        with self.assertNumQueries(1):
+            restaurants = self.client.get('/api/restaurants/').json()
+        self.assertIn(menu, restaurants)
+
+    def test_invalidated_only_for_changed_restaurant(self):
+        self.client.get(f'/api/restaurants/{self.restaurant.id}/menu/')
+        self.client.get(f'/api/restaurants/{self.other_restaurant.id}/menu/')
+        menu_item = self.restaurant.menu_items.filter(availability=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.availability = False
+            menu_item.save()
+
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/restaurants/{self.other_restaurant.id}/menu/')
+        with self.assertNumQueries(1):
+            menu = self.client.get(f'/api/restaurants/{self.restaurant.id}/menu/').json()
+        self.assertNotIn(menu_item.product_id, {product['id'] for product in menu['menu']})
+
+    def test_late_write_does_not_restore_stale_menu(self):
+        # запрос прочитал меню из базы до коммита изменений, а записал в кэш уже после
+        cache = get_catalog_cache()
+        stale_key = get_menu_key(cache, self.restaurant.id)
+        stale_menu = dump_restaurant_menu(self.restaurant.id)
+        menu_item = self.restaurant.menu_items.filter(availability=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.availability = False
+            menu_item.save()
+        cache.set(stale_key, stale_menu)
+
+        menu = self.client.get(f'/api/restaurants/{self.restaurant.id}/menu/').json()
+        self.assertNotIn(menu_item.product_id, {product['id'] for product in menu['menu']})
+
+    def test_products_list_restaurants(self):
+        products = self.client.get('/api/products/', {'fields': 'id,restaurants'}).json()
+
+        self.assertEqual(
+            {(product['id'], restaurant['id']) for product in products for restaurant in product['restaurants']},
+            set(RestaurantMenuItem.objects.filter(availability=True).values_list('product_id', 'restaurant_id')),
+        )
+
+
+class JSONRenderingTest(TestCase):
+    def setUp(self):
+        generate_fixtures(restaurants=2, products=20, orders=0)
+
+    def test_compact_unless_pretty(self):
+        response = self.client.get('/api/products/')
+        pretty_response = self.client.get('/api/products/', {'pretty': 1})
+
+        self.assertNotIn(b'\n', response.content)
+        self.assertIn(b'\n  ', pretty_response.content)
+        self.assertEqual(response.json(), pretty_response.json())
+
+    def test_compressed_above_threshold(self):
+        banners_size = len(self.client.get('/api/banners/').content)
+        with override_settings(COMPRESSION_MIN_SIZE=banners_size + 1):
+            response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip')
+            banners_response = self.client.get('/api/banners/', HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.client.get('/api/products/').json())
+        self.assertFalse(banners_response.has_header('Content-Encoding'))
+
+
+class CatalogSnapshotTest(TestCase):
+    def setUp(self):
+        snapshot_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_dir.cleanup)
+        settings_override = override_settings(
+            CATALOG_SNAPSHOT_DIR=snapshot_dir.name,
+            CATALOG_SNAPSHOT_URL='/media/catalog/',
+            CATALOG_SNAPSHOT_ON_CHANGE=True,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.snapshot_dir = snapshot_dir.name
+
+    def test_rebuilt_on_catalog_change(self):
+        self.assertEqual(self.client.get('/api/catalog/').status_code, 404)
+        generate_fixtures(restaurants=2, products=5, orders=0)
+        snapshot = self.client.get('/api/catalog/').json()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.available().first().delete()
+        new_snapshot = self.client.get('/api/catalog/').json()
+
+        self.assertNotEqual(new_snapshot['products'], snapshot['products'])
+        self.assertEqual(new_snapshot['banners'], snapshot['banners'])
+        products_path = os.path.join(self.snapshot_dir, os.path.basename(new_snapshot['products']))
+        with gzip.open(f'{products_path}.gz') as file:
+            self.assertEqual(json.load(file), self.client.get('/api/products/').json())
+
+    def test_concurrent_writes(self):
+        path = os.path.join(self.snapshot_dir, 'products.json')
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda number: write_file(path, str(number).encode()), range(50)))
+
+        self.assertEqual(os.listdir(self.snapshot_dir), ['products.json'])
+
+
+class IncludeAvailableRestaurantsTimingTest(TestCase):
+    """Подбор ресторанов для доски заказов должен укладываться в бюджет времени на большом наборе данных"""
+    time_budget = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_fixtures(restaurants=100, products=100, orders=2000)
+
+    def assertWithinBudget(self, orders):
+        started_at = time.perf_counter()
+        orders = list(orders)
+        duration = time.perf_counter() - started_at
+
+        self.assertEqual(len(orders), 2000)
+        self.assertTrue(any(order.restaurants for order in orders))
+        self.assertLess(duration, self.time_budget)
+
+    def test_all_restaurants(self):
+        self.assertWithinBudget(Order.objects.include_available_restaurants())
+
+    def test_nearest_restaurants(self):
+        self.assertWithinBudget(Order.objects.include_available_restaurants(limit=5))
@@ -1,6 +1,7 @@
 from django.urls import path
 
-from .views import product_list_api, banners_list_api, register_order
+from .views import product_list_api, banners_list_api, catalog_snapshot_api, register_order, register_orders_batch
+from .views import restaurant_list_api, restaurant_menu_api
 
 
 app_name = "foodcartapp"
@@ -8,5 +9,9 @@ app_name = "foodcartapp"
 urlpatterns = [
     path('products/', product_list_api),
     path('banners/', banners_list_api),
+    path('catalog/', catalog_snapshot_api),
+    path('restaurants/', restaurant_list_api),
+    path('restaurants/<int:restaurant_id>/menu/', restaurant_menu_api),
     path('order/', register_order),
+    path('orders/batch/', register_orders_batch),
 ]
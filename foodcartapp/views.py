@@ -1,65 +1,140 @@
-from django.http import JsonResponse
-from django.templatetags.static import static
-from django.db import transaction
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django import forms
+from django.conf import settings
+from django.http import Http404
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.views.decorators.http import condition
+from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework.serializers import ModelSerializer
-from .models import Product, Order, OrderItem
+from rest_framework.serializers import IntegerField, ModelSerializer, ValidationError
+from coordinates.normalization import normalize_address
+from star_burger.renderers import JSONResponse
+from .catalog import PRODUCT_FIELDS, dump_banners, dump_products, get_cached_catalog, get_catalog_version
+from .catalog_snapshot import get_catalog_snapshot
+from .menus import get_restaurant_menu, get_restaurant_menus
+from .models import Product, Order, OrderItem, OrderProcessingTask, IdempotencyKey
+from .order_validation import attach_products, dump_order, validate_order_payload
 
 
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    return JSONResponse(dump_banners(), request)
+
+
+def get_request_catalog_version(request):
+    """Версия каталога, прочитанная один раз за запрос, чтобы ETag, Last-Modified и тело ответа ей соответствовали"""
+    if not hasattr(request, 'catalog_version'):
+        request.catalog_version = get_catalog_version()
+    return request.catalog_version
+
+
+def get_catalog_etag(request):
+    version = get_request_catalog_version(request)
+    return version and version['id']
+
+
+def get_catalog_last_modified(request):
+    version = get_request_catalog_version(request)
+    return version and datetime.fromtimestamp(version['modified'], tz=dt_timezone.utc)
+
+
+class ProductsFilter(forms.Form):
+    fields = forms.CharField(required=False)
+    category = forms.CharField(required=False)
+    cursor = forms.IntegerField(required=False, min_value=0)
+    limit = forms.IntegerField(required=False, min_value=1)
+
+    def clean_fields(self):
+        """Поля ответа через запятую, например ?fields=id,name,price"""
+        fields = [field for field in self.cleaned_data['fields'].split(',') if field]
+        unknown_fields = set(fields) - PRODUCT_FIELDS.keys()
+        if unknown_fields:
+            raise forms.ValidationError(f'Неизвестные поля: {", ".join(sorted(unknown_fields))}')
+        return sorted(fields, key=list(PRODUCT_FIELDS).index) or None
+
+    def clean_category(self):
+        """id категорий через запятую"""
+        category_ids = [category_id for category_id in self.cleaned_data['category'].split(',') if category_id]
+        if not all(category_id.isdigit() for category_id in category_ids):
+            raise forms.ValidationError('Ожидаются id категорий через запятую')
+        return sorted({int(category_id) for category_id in category_ids})
+
+    def clean_limit(self):
+        limit = self.cleaned_data['limit']
+        return min(limit, settings.CATALOG_MAX_PAGE_SIZE) if limit else None
 
 
+@condition(etag_func=get_catalog_etag, last_modified_func=get_catalog_last_modified)
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            },
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    """Доступные товары. С параметрами cursor или limit ответ разбит на страницы по id товаров.
+
+    ETag и Last-Modified берутся из версии каталога, поэтому на повторный запрос ответ 304 без запросов к базе.
+    """
+    products_filter = ProductsFilter(request.GET)
+    if not products_filter.is_valid():
+        # ErrorList orjson сериализует как пустой список, поэтому отдаем сообщения обычными списками
+        errors = {name: list(field_errors) for name, field_errors in products_filter.errors.items()}
+        return JSONResponse(errors, request, status=status.HTTP_400_BAD_REQUEST)
+    filters = products_filter.cleaned_data
+    fields = filters['fields']
+    category_ids = filters['category']
+    cache_name = f'products:{",".join(fields or [])}:{",".join(map(str, category_ids))}'
+
+    is_paginated = filters['cursor'] is not None or filters['limit'] is not None
+    if not is_paginated:
+        dumped_products = get_cached_catalog(
+            cache_name,
+            lambda: dump_products(fields, category_ids),
+            version=get_request_catalog_version(request),
+        )
+        return JSONResponse(dumped_products, request)
+
+    # курсор страницы — id последнего товара предыдущей, поэтому id отдаем всегда
+    if fields and 'id' not in fields:
+        fields = ['id'] + fields
+    cursor = filters['cursor']
+    limit = filters['limit'] or settings.CATALOG_PAGE_SIZE
+    # берем на один товар больше, чтобы узнать, есть ли следующая страница
+    dumped_products = get_cached_catalog(
+        f'{cache_name}:{cursor}:{limit}',
+        lambda: dump_products(fields, category_ids, after=cursor, limit=limit + 1),
+        version=get_request_catalog_version(request),
+    )
+    next_url = None
+    if len(dumped_products) > limit:
+        dumped_products = dumped_products[:limit]
+        next_page_params = request.GET.copy()
+        next_page_params['cursor'] = dumped_products[-1]['id']
+        next_url = request.build_absolute_uri(f'?{next_page_params.urlencode()}')
+    return JSONResponse({'results': dumped_products, 'next': next_url}, request)
+
+
+def catalog_snapshot_api(request):
+    """Адреса последних заранее собранных файлов каталога, которые отдает nginx"""
+    snapshot = get_catalog_snapshot()
+    if not snapshot:
+        raise Http404('Снимок каталога еще не собран')
+    return JSONResponse(snapshot, request)
+
+
+def restaurant_list_api(request):
+    return JSONResponse(get_restaurant_menus(), request)
+
+
+def restaurant_menu_api(request, restaurant_id):
+    restaurant_menu = get_restaurant_menu(restaurant_id)
+    if restaurant_menu is None:
+        raise Http404('Ресторан не найден')
+    return JSONResponse(restaurant_menu, request)
 
 
 class OrderItemSerializer(ModelSerializer):
+    product = IntegerField()
+
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity']
@@ -72,22 +147,162 @@ class OrderSerializer(ModelSerializer):
         model = Order
         fields = ['firstname', 'lastname', 'phonenumber', 'address', 'products']
 
+    def validate_products(self, items):
+        """Проверяет товары заказа одним запросом и подставляет вместо id сами товары.
+
+        Товары можно передать заранее через контекст сериализатора с ключом products.
+        """
+        items, errors = attach_products(items, self.context.get('products'))
+        if errors:
+            raise ValidationError(errors)
+        return items
+
+
+def validate_order(order_data, products=None):
+    """Проверяет заказ быстрым валидатором или OrderSerializer, смотря по настройке ORDER_FAST_VALIDATION.
+
+    Возвращает (validated_data, errors), ошибки в обоих случаях в формате OrderSerializer.
+    """
+    if settings.ORDER_FAST_VALIDATION:
+        return validate_order_payload(order_data, products)
+    serializer = OrderSerializer(data=order_data, context={'products': products})
+    if serializer.is_valid():
+        return serializer.validated_data, None
+    return None, serializer.errors
+
+
+def create_orders(orders_data):
+    """Сохраняет проверенные заказы вместе с их позициями"""
+    orders = [
+        Order(
+            firstname=order_data['firstname'],
+            lastname=order_data['lastname'],
+            phonenumber=order_data['phonenumber'],
+            address=order_data['address'],
+            total=sum(item['product'].price * item['quantity'] for item in order_data['items']),
+        )
+        for order_data in orders_data
+    ]
+    if connection.features.can_return_rows_from_bulk_insert:
+        Order.objects.bulk_create(orders)
+        # bulk_create не вызывает Order.save, поэтому задачи обработки ставим в очередь сами
+        OrderProcessingTask.objects.bulk_create([
+            OrderProcessingTask(order=order) for order in orders if normalize_address(order.address)
+        ])
+    else:
+        for order in orders:
+            order.save()
+
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, price=item_parameters['product'].price, **item_parameters)
+        for order, order_data in zip(orders, orders_data)
+        for item_parameters in order_data['items']
+    ])
+    return orders
+
+
+def get_request_hash(request_data):
+    """Хэш тела запроса, не зависящий от порядка ключей и форматирования JSON"""
+    request_json = json.dumps(request_data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(request_json.encode()).hexdigest()
+
+
+def get_stored_response(idempotency_key, request_hash):
+    """Возвращает сохраненный ответ на запрос с таким же ключом идемпотентности, если он еще действует.
+
+    Если ключ уже использован с другим телом запроса, возвращает ошибку 422.
+    """
+    stored_response = IdempotencyKey.objects.filter(key=idempotency_key).first()
+    if not stored_response:
+        return None
+    if stored_response.expires_at <= timezone.now():
+        stored_response.delete()
+        return None
+    # у ключей, сохраненных до появления хэша, тело запроса не проверяем
+    if stored_response.request_hash and stored_response.request_hash != request_hash:
+        return Response(
+            {'Idempotency-Key': ['Ключ уже использован для другого запроса.']},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(stored_response.response_data, status=stored_response.status_code)
+
 
 @api_view(['POST'])
 @transaction.atomic()
 def register_order(request):
-    serializer = OrderSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
-
-    order = Order.objects.create(
-        firstname=serializer.validated_data['firstname'],
-        lastname=serializer.validated_data['lastname'],
-        phonenumber=serializer.validated_data['phonenumber'],
-        address=serializer.validated_data['address']
-    )
-    for item_parameters in serializer.validated_data['items']:
-        order_item = OrderItem.objects.create(order=order, price = item_parameters['product'].price, **item_parameters)
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        if len(idempotency_key) > IdempotencyKey._meta.get_field('key').max_length:
+            raise ValidationError({'Idempotency-Key': ['Слишком длинный ключ идемпотентности.']})
+        request_hash = get_request_hash(request.data)
+        stored_response = get_stored_response(idempotency_key, request_hash)
+        if stored_response:
+            return stored_response
+
+    order_data, errors = validate_order(request.data)
+    if errors:
+        raise ValidationError(errors)
+
+    [order] = create_orders([order_data])
+    response_data = dump_order(order)
+
+    if idempotency_key:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    key=idempotency_key,
+                    request_hash=request_hash,
+                    response_data=response_data,
+                    status_code=status.HTTP_200_OK,
+                    expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                )
+        except IntegrityError:
+            # такой же запрос обрабатывается параллельно, этот заказ не сохраняем
+            transaction.set_rollback(True)
+            return Response(
+                {'Idempotency-Key': ['Запрос с таким ключом уже обрабатывается.']},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+    return Response(response_data)
+
+
+@api_view(['POST'])
+@transaction.atomic()
+def register_orders_batch(request):
+    """Принимает список заказов от партнеров.
+
+    Заказы проверяются независимо друг от друга, все товары ищутся одним запросом. Ответ — список
+    результатов в порядке заказов: id созданного заказа или ошибки, из-за которых он не сохранен.
+    """
+    orders_data = request.data
+    if not isinstance(orders_data, list) or not orders_data:
+        raise ValidationError({'non_field_errors': ['Ожидается непустой список заказов.']})
+    if len(orders_data) > settings.ORDERS_BATCH_MAX_SIZE:
+        raise ValidationError({'non_field_errors': [
+            f'В одном запросе можно передать не больше {settings.ORDERS_BATCH_MAX_SIZE} заказов.'
+        ]})
+
+    product_ids = set()
+    for order_data in orders_data:
+        products = order_data.get('products') if isinstance(order_data, dict) else None
+        for item in products if isinstance(products, list) else []:
+            product_id = item.get('product') if isinstance(item, dict) else None
+            if isinstance(product_id, int) or isinstance(product_id, str) and product_id.isdigit():
+                product_ids.add(int(product_id))
+    products = Product.objects.in_bulk(product_ids)
+
+    results = []
+    valid_orders_data = []
+    for order_data in orders_data:
+        validated_data, errors = validate_order(order_data, products)
+        if errors:
+            results.append({'created': False, 'errors': errors})
+        else:
+            valid_orders_data.append(validated_data)
+            results.append(None)
 
-    responce_serializer = OrderSerializer(instance=order)
+    created_orders = iter(create_orders(valid_orders_data))
+    results = [result or {'created': True, 'id': next(created_orders).id} for result in results]
 
-    return Response(responce_serializer.data)
+    return Response(results)
@@ -1,3 +1,104 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
 
-# Create your tests here.
+from coordinates.models import Location
+from foodcartapp.models import Order, OrderCandidateRestaurant, Product
+from foodcartapp.order_processing import process_pending_order_tasks
+from foodcartapp.tests import QueryCountMixin, generate_fixtures
+
+
+class QueryCountTest(QueryCountMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        manager = User.objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def test_view_products(self):
+        self.assertQueriesAtEveryScale(5, reverse('restaurateur:ProductsView'))
+
+    def test_view_restaurants(self):
+        self.assertQueriesAtEveryScale(3, reverse('restaurateur:RestaurantView'))
+
+    def test_view_orders(self):
+        self.assertQueriesAtEveryScale(8, reverse('restaurateur:view_orders'))
+
+
+class OrderBoardTest(TestCase):
+    def setUp(self):
+        generate_fixtures(restaurants=2, products=1, orders=0, **{'menu-share': 1})
+        manager = User.objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+
+    def create_order(self, address):
+        Location.objects.create(address=address, longitude=37.6, latitude=55.7)
+        order = Order.objects.create(firstname='Иван', lastname='Петров', phonenumber='+79991234567', address=address)
+        product = Product.objects.get()
+        order.items.create(product=product, quantity=1, price=product.price)
+        return order
+
+    @override_settings(YANDEX_GEOCODER_URL='http://127.0.0.1:9/', GEOCODER_TIMEOUT=0.5)
+    def test_processed_orders_use_stored_candidates(self):
+        processed_order = self.create_order('Москва, ул. Тверская, д. 1')
+        self.assertEqual(process_pending_order_tasks(), (1, 1))
+        self.assertEqual(processed_order.candidate_restaurants.count(), 2)
+        OrderCandidateRestaurant.objects.update(distance=123.45)
+        pending_order = self.create_order('Москва, ул. Арбат, д. 10')
+
+        response = self.client.get(reverse('restaurateur:view_orders'))
+        orders = {order.id: order for order in response.context['order_items']}
+
+        self.assertEqual({distance for _, distance in orders[processed_order.id].restaurants}, {123.45})
+        self.assertEqual(orders[pending_order.id].restaurants_count, 2)
+        self.assertNotIn(123.45, {distance for _, distance in orders[pending_order.id].restaurants})
+
+
+@override_settings(ORDERS_PAGE_SIZE=2)
+class OrdersPaginationTest(TestCase):
+    def setUp(self):
+        manager = User.objects.create_user('manager', is_staff=True)
+        self.client.force_login(manager)
+        created_at = timezone.now()
+        self.orders = [
+            Order.objects.create(
+                firstname='Иван', lastname='Петров', phonenumber='+79991234567', address='',
+                created_at=created_at, status=status, payment_method=payment_method,
+            )
+            for status, payment_method in [
+                ('NEW', 'CARD'), ('NEW', 'CASH'), ('CLOSED', 'CARD'), ('NEW', 'CARD'), ('NEW', 'CASH'),
+            ]
+        ]
+
+    def get_order_ids(self, url):
+        order_ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            order_ids += [order.id for order in response.context['order_items']]
+            next_page_url = response.context['next_page_url']
+            url = next_page_url and reverse('restaurateur:view_orders') + next_page_url
+        return order_ids
+
+    def test_pages_cover_orders_with_same_created_at(self):
+        self.assertEqual(
+            self.get_order_ids(reverse('restaurateur:view_orders')),
+            [order.id for order in self.orders if order.status == 'NEW'],
+        )
+
+    def test_filters(self):
+        url = reverse('restaurateur:view_orders')
+        self.assertEqual(
+            self.get_order_ids(f'{url}?payment_method=CARD'),
+            [order.id for order in self.orders if order.status == 'NEW' and order.payment_method == 'CARD'],
+        )
+        self.assertEqual(self.get_order_ids(f'{url}?status=CLOSED'), [self.orders[2].id])
+
+    def test_malformed_cursor_is_ignored(self):
+        url = reverse('restaurateur:view_orders')
+        first_page = self.client.get(url).context['order_items']
+        for cursor in ['5_2020-13-45T00:00', '5_2020-01-01T00:00', 'x_2020-01-01T00:00+00:00', 'garbage']:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(url, {'after': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['order_items'], first_page)
@@ -1,11 +1,14 @@
 from django import forms
+from django.conf import settings
 from django.shortcuts import redirect, render
 from django.views import View
 from django.urls import reverse_lazy
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
-from django.db.models import Sum, F
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from foodcartapp.models import Product, Restaurant, Order
 
 
@@ -26,6 +29,45 @@ class Login(forms.Form):
     )
 
 
+class OrdersFilter(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус', required=False,
+        choices=[('', 'Необработанные')] + Order.ORDER_STATUS_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    payment_method = forms.ChoiceField(
+        label='Способ оплаты', required=False,
+        choices=[('', 'Любой')] + Order.ORDER_PAYMENT_METHOD_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан', required=False,
+        queryset=Restaurant.objects.order_by('name'),
+        empty_label='Любой',
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    after = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean_after(self):
+        """Курсор страницы вида «<id>_<дата создания>» — последний заказ предыдущей страницы"""
+        cursor = self.cleaned_data['after']
+        if not cursor:
+            return None
+        order_id, _, created_at = cursor.partition('_')
+        try:
+            created_at = parse_datetime(created_at)
+        except ValueError:
+            # дата в правильном формате, но несуществующая, например 2020-13-45
+            created_at = None
+        if not order_id.isdigit() or not created_at or timezone.is_naive(created_at):
+            raise forms.ValidationError('Некорректный курсор страницы')
+        return created_at, int(order_id)
+
+
+def get_orders_cursor(order):
+    return f'{order.id}_{order.created_at.isoformat()}'
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -64,7 +106,7 @@ def is_manager(user):
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
     restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
+    products = list(Product.objects.select_related('category').prefetch_related('menu_items'))
 
     default_availability = {restaurant.id: False for restaurant in restaurants}
     products_with_restaurants = []
@@ -94,7 +136,44 @@ def view_restaurants(request):
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
-    OrderQuerySet = Order.objects.exclude(status='CLOSED').calculate_order_sum().include_available_restaurants()
+    orders_filter = OrdersFilter(request.GET)
+    orders_filter.is_valid()
+    filters = orders_filter.cleaned_data
+
+    orders = Order.objects.all()
+    if filters.get('status'):
+        orders = orders.filter(status=filters['status'])
+    else:
+        orders = orders.exclude(status='CLOSED')
+    if filters.get('payment_method'):
+        orders = orders.filter(payment_method=filters['payment_method'])
+    if filters.get('restaurant'):
+        orders = orders.filter(restaurant=filters['restaurant'])
+    if filters.get('after'):
+        created_at, order_id = filters['after']
+        orders = orders.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=order_id))
+
+    page_size = settings.ORDERS_PAGE_SIZE
+    # берем на один заказ больше, чтобы узнать, есть ли следующая страница
+    orders = list(
+        orders
+            .order_by('created_at', 'id')[:page_size + 1]
+            .include_candidate_restaurants(limit=settings.ORDER_BOARD_RESTAURANTS_LIMIT)
+    )
+    next_page_url = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_page_params = request.GET.copy()
+        next_page_params['after'] = get_orders_cursor(orders[-1])
+        next_page_url = f'?{next_page_params.urlencode()}'
+
+    first_page_params = request.GET.copy()
+    first_page_params.pop('after', None)
+
     return render(request, template_name='order_items.html', context={
-        'order_items': OrderQuerySet,
+        'order_items': orders,
+        'orders_filter': orders_filter,
+        'next_page_url': next_page_url,
+        'first_page_url': f'?{first_page_params.urlencode()}',
+        'is_first_page': not filters.get('after'),
     })
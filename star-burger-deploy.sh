@@ -24,8 +24,9 @@ python3 manage.py collectstatic --noinput
 python3 manage.py makemigrations --dry-run --check
 python3 manage.py migrate --noinput
 
-#restart application
+#restart application and order processing worker
 systemctl restart star-burger.service
+systemctl restart star-burger-worker.service
 
 #reload nginx
 systemctl reload nginx.service
@@ -0,0 +1,59 @@
+"""Сжатие JSON-ответов brotli или gzip, смотря что поддерживает клиент.
+
+Ответы меньше COMPRESSION_MIN_SIZE байт не сжимаются: выигрыш там меньше затрат. Brotli
+используется, только если установлен пакет Brotli.
+"""
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = ('application/json',)
+
+
+def accepts_encoding(request, encoding):
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    return re.search(rf'\b{encoding}\b', accept_encoding) is not None
+
+
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if brotli and accepts_encoding(request, 'br'):
+            encoding, content = 'br', brotli.compress(response.content, quality=5)
+        elif accepts_encoding(request, 'gzip'):
+            encoding, content = 'gzip', compress_string(response.content)
+        else:
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        # сжатый ответ отличается от несжатого побайтно, поэтому ETag становится слабым, как в GZipMiddleware
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        return response
+
+    @staticmethod
+    def is_compressible(response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        return (
+            not response.streaming
+            and not response.has_header('Content-Encoding')
+            and content_type in COMPRESSIBLE_CONTENT_TYPES
+            and len(response.content) >= settings.COMPRESSION_MIN_SIZE
+        )
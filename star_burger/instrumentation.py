@@ -0,0 +1,190 @@
+"""Замеры времени обработки запросов.
+
+InstrumentationMiddleware считает для каждого запроса общее время, число и время запросов к базе,
+время обращений к геокодеру и рендеринга шаблонов. Замеры уходят клиенту в заголовке Server-Timing
+и копятся в гистограммах по имени view, которые отдает view metrics в текстовом формате Prometheus
+вместе со счетчиками кэша координат.
+
+Метрики отдаются сотрудникам и запросам с заголовком Authorization: Bearer <METRICS_TOKEN>. Адрес
+клиента не проверяется: за nginx REMOTE_ADDR у всех запросов 127.0.0.1.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.backends import django as django_backend
+from django.utils.crypto import constant_time_compare
+
+from coordinates.cache import coordinates_cache
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+METRICS = [
+    # имя метрики, ключ замера, границы корзин, описание
+    ('starburger_request_duration_seconds', 'total', DURATION_BUCKETS, 'Время обработки запроса'),
+    ('starburger_db_duration_seconds', 'db', DURATION_BUCKETS, 'Время запросов к базе'),
+    ('starburger_db_queries', 'db_queries', QUERIES_BUCKETS, 'Число запросов к базе'),
+    ('starburger_geocoder_duration_seconds', 'geocoder', DURATION_BUCKETS, 'Время запросов к геокодеру'),
+    ('starburger_template_duration_seconds', 'template', DURATION_BUCKETS, 'Время рендеринга шаблонов'),
+]
+
+COORDINATES_CACHE_METRICS = [
+    # имя метрики, тип, ключ в CoordinatesCache.stats(), описание
+    ('starburger_coordinates_cache_hits_total', 'counter', 'hits', 'Попадания в кэш координат процесса'),
+    ('starburger_coordinates_cache_shared_hits_total', 'counter', 'shared_hits',
+     'Попадания в общий кэш координат после промаха в кэше процесса'),
+    ('starburger_coordinates_cache_misses_total', 'counter', 'misses', 'Промахи кэша координат'),
+    ('starburger_coordinates_cache_evictions_total', 'counter', 'evictions',
+     'Записи, вытесненные из переполненного кэша координат'),
+    ('starburger_coordinates_cache_size', 'gauge', 'size', 'Число записей в кэше координат процесса'),
+    ('starburger_coordinates_cache_max_size', 'gauge', 'maxsize', 'Наибольшее число записей в кэше координат'),
+]
+
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bucket in enumerate(self.buckets):
+            if value <= bucket:
+                self.counts[index] += 1
+
+
+class Registry:
+    """Гистограммы замеров по имени view. Живут в памяти процесса, каждый воркер считает свои"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(dict)
+
+    def observe(self, view_name, timings):
+        with self.lock:
+            histograms = self.histograms[view_name]
+            for _, key, buckets, _ in METRICS:
+                if key not in histograms:
+                    histograms[key] = Histogram(buckets)
+                histograms[key].observe(timings.get(key, 0))
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric, key, buckets, description in METRICS:
+                lines.append(f'# HELP {metric} {description}')
+                lines.append(f'# TYPE {metric} histogram')
+                for view_name, histograms in sorted(self.histograms.items()):
+                    histogram = histograms[key]
+                    labels = f'view="{view_name}"'
+                    for bucket, count in zip(buckets, histogram.counts):
+                        lines.append(f'{metric}_bucket{{{labels},le="{bucket}"}} {count}')
+                    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{{labels}}} {histogram.sum:.6f}')
+                    lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def render_coordinates_cache_metrics():
+    stats = coordinates_cache.stats()
+    lines = []
+    for metric, metric_type, key, description in COORDINATES_CACHE_METRICS:
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} {metric_type}')
+        lines.append(f'{metric} {stats[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def measure(key):
+    """Прибавляет время выполнения блока к замеру key текущего запроса. Вне запроса ничего не делает"""
+    timings = getattr(_local, 'timings', None)
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[key] += time.perf_counter() - started_at
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = _local.timings = defaultdict(float)
+        started_at = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self.measure_query))
+                response = self.get_response(request)
+        finally:
+            _local.timings = None
+        timings['total'] = time.perf_counter() - started_at
+
+        resolver_match = request.resolver_match
+        registry.observe(resolver_match.view_name if resolver_match else 'unresolved', timings)
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={timings["total"] * 1000:.1f}',
+            f'db;dur={timings["db"] * 1000:.1f};desc="{timings["db_queries"]:.0f} queries"',
+            f'geocoder;dur={timings["geocoder"] * 1000:.1f}',
+            f'template;dur={timings["template"] * 1000:.1f}',
+        ])
+        return response
+
+    @staticmethod
+    def measure_query(execute, sql, params, many, context):
+        _local.timings['db_queries'] += 1
+        with measure('db'):
+            return execute(sql, params, many, context)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with measure('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблонизатор Django, который замеряет время рендеринга шаблонов"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except django_backend.TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def has_metrics_access(request):
+    if request.user.is_staff:
+        return True
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _, token = authorization.partition(' ')
+    return bool(settings.METRICS_TOKEN) and scheme == 'Bearer' and constant_time_compare(token, settings.METRICS_TOKEN)
+
+
+def metrics(request):
+    if not has_metrics_access(request):
+        raise Http404
+    content = registry.render() + render_coordinates_cache_metrics()
+    return HttpResponse(content, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,75 @@
+"""Выборочное профилирование запросов через cProfile.
+
+Профилируется доля запросов PROFILING_SAMPLE_RATE, а также запросы сотрудников с подписанным
+параметром ?profile=<токен> (токен выдает команда profiling_token). Профили пишутся в .prof-файлы
+в PROFILING_DIR/<имя view>/, старые файлы удаляются, когда их становится больше PROFILING_MAX_FILES.
+Свести профили вместе помогает команда summarize_profiles.
+"""
+import cProfile
+import os
+import random
+import re
+import time
+
+from django.conf import settings
+from django.core import signing
+
+PROFILING_TOKEN_SALT = 'star_burger.profiling'
+
+
+def make_profiling_token():
+    return signing.dumps('profile', salt=PROFILING_TOKEN_SALT)
+
+
+def is_profiling_token_valid(token):
+    try:
+        signing.loads(token, salt=PROFILING_TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def get_profiles_dir(view_name):
+    return os.path.join(settings.PROFILING_DIR, re.sub(r'[^\w.-]+', '_', view_name))
+
+
+def rotate_profiles(profiles_dir):
+    profiles = sorted(entry.path for entry in os.scandir(profiles_dir) if entry.name.endswith('.prof'))
+    for path in profiles[:-settings.PROFILING_MAX_FILES]:
+        os.remove(path)
+
+
+class ProfilingMiddleware:
+    """Должен стоять после AuthenticationMiddleware, чтобы проверять права на параметр profile"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+
+        resolver_match = request.resolver_match
+        profiles_dir = get_profiles_dir(resolver_match.view_name if resolver_match else 'unresolved')
+        os.makedirs(profiles_dir, exist_ok=True)
+        path = os.path.join(profiles_dir, f'{time.time():.6f}-{os.getpid()}.prof')
+        profiler.dump_stats(path)
+        rotate_profiles(profiles_dir)
+
+        if 'profile' in request.GET:
+            response['X-Profile'] = os.path.relpath(path, settings.PROFILING_DIR)
+        return response
+
+    @staticmethod
+    def should_profile(request):
+        token = request.GET.get('profile')
+        if token and request.user.is_staff and is_profiling_token_valid(token):
+            return True
+        return random.random() < settings.PROFILING_SAMPLE_RATE
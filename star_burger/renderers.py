@@ -0,0 +1,59 @@
+"""Быстрая сериализация JSON для ответов API.
+
+Если установлен orjson, JSON собирается им, иначе стандартным модулем json. По умолчанию ответ
+компактный, с параметром ?pretty=1 — с отступами. JSONResponse подходит для обычных view,
+JSONRenderer — для view Django REST framework.
+"""
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default(obj):
+    # цены отдаем строками, как DjangoJSONEncoder, чтобы не терять точность
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return DjangoJSONEncoder().default(obj)
+
+
+def dumps(data, pretty=False):
+    """Возвращает data в JSON в виде байтов"""
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=default, option=option)
+
+    if pretty:
+        return json.dumps(data, default=default, ensure_ascii=False, indent=2).encode()
+    return json.dumps(data, default=default, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def is_pretty(request):
+    return request is not None and request.GET.get('pretty') == '1'
+
+
+class JSONResponse(HttpResponse):
+    def __init__(self, data, request=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data, pretty=is_pretty(request)), **kwargs)
+
+
+class JSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        request = (renderer_context or {}).get('request')
+        return dumps(data, pretty=is_pretty(request))
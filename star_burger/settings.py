@@ -12,6 +12,22 @@ env.read_env(env_path)
 SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', True)
 YANDEX_GEOCODER_KEY = env('YANDEX_GEOCODER_KEY')
+YANDEX_GEOCODER_URL = env.str('YANDEX_GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 10)
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 8)
+DISTANCE_CALCULATION_METHOD = env.str('DISTANCE_CALCULATION_METHOD', 'haversine')
+RESTAURANTS_INDEX_CELL_SIZE = env.float('RESTAURANTS_INDEX_CELL_SIZE', 0.05)
+ORDER_BOARD_RESTAURANTS_LIMIT = env.int('ORDER_BOARD_RESTAURANTS_LIMIT', 5)
+ORDERS_PAGE_SIZE = env.int('ORDERS_PAGE_SIZE', 50)
+ORDER_PROCESSING_MAX_ATTEMPTS = env.int('ORDER_PROCESSING_MAX_ATTEMPTS', 5)
+IDEMPOTENCY_KEY_TTL = env.int('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+ORDERS_BATCH_MAX_SIZE = env.int('ORDERS_BATCH_MAX_SIZE', 500)
+ORDER_FAST_VALIDATION = env.bool('ORDER_FAST_VALIDATION', False)
+COORDINATES_CACHE_SIZE = env.int('COORDINATES_CACHE_SIZE', 10000)
+COORDINATES_CACHE_TTL = env.int('COORDINATES_CACHE_TTL', 24 * 60 * 60)
+COORDINATES_CACHE_ALIAS = env.str('COORDINATES_CACHE_ALIAS', None)
+LOCATION_TTL = env.int('LOCATION_TTL', 180 * 24 * 60 * 60)
+LOCATION_NOT_FOUND_TTL = env.int('LOCATION_NOT_FOUND_TTL', 7 * 24 * 60 * 60)
 
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', ['127.0.0.1', 'localhost'])
 
@@ -25,25 +41,39 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'debug_toolbar',
     'phonenumber_field',
     'rest_framework',
 ]
 
 MIDDLEWARE = [
+    'star_burger.instrumentation.InstrumentationMiddleware',
+    'star_burger.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'star_burger.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
     'rollbar.contrib.django.middleware.RollbarNotifierMiddlewareExcluding404',
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(-1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'star_burger.urls'
 
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'star_burger.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+COMPRESSION_MIN_SIZE = env.int('COMPRESSION_MIN_SIZE', 1024)
+
 DEBUG_TOOLBAR_PANELS = [
     'debug_toolbar.panels.versions.VersionsPanel',
     'debug_toolbar.panels.timer.TimerPanel',
@@ -61,7 +91,7 @@ DEBUG_TOOLBAR_PANELS = [
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'star_burger.instrumentation.DjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, "templates"),
         ],
@@ -82,10 +112,23 @@ WSGI_APPLICATION = 'star_burger.wsgi.application'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+CATALOG_SNAPSHOT_DIR = env.str('CATALOG_SNAPSHOT_DIR', os.path.join(MEDIA_ROOT, 'catalog'))
+CATALOG_SNAPSHOT_URL = env.str('CATALOG_SNAPSHOT_URL', MEDIA_URL + 'catalog/')
+CATALOG_SNAPSHOT_ON_CHANGE = env.bool('CATALOG_SNAPSHOT_ON_CHANGE', False)
+CATALOG_SNAPSHOT_KEEP = env.int('CATALOG_SNAPSHOT_KEEP', 5)
+
 DATABASES = {
     'default': dj_database_url.parse(env.str('DATABASE_URL'))
 }
 
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
+CATALOG_CACHE_ALIAS = env.str('CATALOG_CACHE_ALIAS', None)
+CATALOG_CACHE_TTL = env.int('CATALOG_CACHE_TTL', 24 * 60 * 60)
+CATALOG_PAGE_SIZE = env.int('CATALOG_PAGE_SIZE', 50)
+CATALOG_MAX_PAGE_SIZE = env.int('CATALOG_MAX_PAGE_SIZE', 200)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,6 +160,13 @@ INTERNAL_IPS = [
     '127.0.0.1'
 ]
 
+METRICS_TOKEN = env.str('METRICS_TOKEN', '')
+
+PROFILING_SAMPLE_RATE = env.float('PROFILING_SAMPLE_RATE', 0)
+PROFILING_DIR = env.str('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILING_MAX_FILES = env.int('PROFILING_MAX_FILES', 100)
+PROFILING_TOKEN_MAX_AGE = env.int('PROFILING_TOKEN_MAX_AGE', 24 * 60 * 60)
+
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "assets"),
     os.path.join(BASE_DIR, "bundles"),